@@ -0,0 +1,192 @@
+"""Monte Carlo balance runs: play lots of seeded games with a scripted player.
+
+Games run headless across all cores. One CSV row per game is written as soon as
+its batch finishes, and a per-level summary is printed at the end:
+
+    python batch.py --games 2000 --levels 1 2 --policy hunter --out results.csv
+    python batch.py --set move_chance=0.4 --set escape_chance=0.3
+
+--policy takes one of the built-in players below or "module:function" for your
+own. A policy is called as policy(world, rng) once per tick and returns a
+World.step action (or None to wait).
+"""
+import argparse
+import csv
+import importlib
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import game
+
+HERO = ('Batman', '🦇')
+OUTCOMES = {'won': 'won', 'caught': 'wolf', 'starved': 'starved'}
+FIELDS = ['level', 'seed', 'policy', 'outcome', 'ticks', 'final_hunger', 'prey_eaten', 'hunger_curve']
+
+
+def idle_policy(world, rng):
+    return None
+
+
+def random_policy(world, rng):
+    return rng.choice([None, 'up', 'down', 'left', 'right', 'eat'])
+
+
+def hunter_policy(world, rng):
+    """Walk at the nearest prey, eat when next to it, huff when a wolf gets close"""
+    px, py = world.player_pos
+    wolf = game.WOLF.id
+    if (any(world.occupancy.near(px, py, 2, wolf)) and
+            world.player_hunger > world.balance['huff_cost'] + 10):
+        return 'huff'
+    if any(animal.species != wolf for animal in world.occupancy.near(px, py, 1)):
+        return 'eat'
+
+    prey = [animal for animal in world.animals if animal.species != wolf]
+    if not prey:
+        return None
+    target = min(prey, key=lambda animal: max(abs(animal.x - px), abs(animal.y - py)))
+    dx = (target.x > px) - (target.x < px)
+    dy = (target.y > py) - (target.y < py)
+    # Close the bigger gap first, and try the other axis if the way is blocked
+    steps = [('right' if dx > 0 else 'left', dx, 0), ('down' if dy > 0 else 'up', 0, dy)]
+    if abs(target.y - py) > abs(target.x - px):
+        steps.reverse()
+    for action, step_x, step_y in steps:
+        if (step_x or step_y) and world.is_position_free(px + step_x, py + step_y):
+            return action
+    return rng.choice(['up', 'down', 'left', 'right'])
+
+
+POLICIES = {
+    'idle': idle_policy,
+    'random': random_policy,
+    'hunter': hunter_policy,
+}
+
+
+def load_policy(name):
+    if name in POLICIES:
+        return POLICIES[name]
+    module, _, function = name.partition(':')
+    if not function:
+        raise ValueError(f"Unknown policy {name!r}: use one of {', '.join(POLICIES)} or module:function")
+    return getattr(importlib.import_module(module), function)
+
+
+def play_game(level, seed, policy_name, balance, max_ticks, sample_every):
+    policy = load_policy(policy_name)
+    world = game.World(level=level, hero=HERO, seed=seed, clock=game.TickClock(), balance=balance)
+    rng = random.Random(seed ^ 0x5EED)  # the player's own dice, separate from the world's
+    prey_at_start = world.prey_remaining()
+    curve = [world.player_hunger]
+    outcome = 'timeout'
+    while world.ticks < max_ticks:
+        result = world.step(policy(world, rng))
+        if world.ticks % sample_every == 0:
+            curve.append(result.hunger)
+        if result.status != 'playing':
+            outcome = OUTCOMES[result.status]
+            break
+    prey_left = world.prey_remaining()
+    return {
+        'level': level,
+        'seed': seed,
+        'policy': policy_name,
+        'outcome': outcome,
+        'ticks': world.ticks,
+        'final_hunger': world.player_hunger,
+        'prey_eaten': prey_at_start - prey_left,
+        'hunger_curve': ' '.join(f"{hunger:g}" for hunger in curve),
+    }
+
+
+def play_batch(games, policy_name, balance, max_ticks, sample_every):
+    """Worker entry point: a list of (level, seed) games in, a list of CSV rows out"""
+    return [play_game(level, seed, policy_name, balance, max_ticks, sample_every) for level, seed in games]
+
+
+def summarize(rows, sample_every):
+    print(f"{'level':>5} {'games':>6} {'win':>6} {'starved':>8} {'wolf':>6} {'timeout':>8} "
+          f"{'ticks to win':>13} {'eaten':>6}")
+    for level in sorted({row['level'] for row in rows}):
+        games = [row for row in rows if row['level'] == level]
+        rate = {outcome: sum(1 for row in games if row['outcome'] == outcome) / len(games)
+                for outcome in ('won', 'starved', 'wolf', 'timeout')}
+        wins = [row['ticks'] for row in games if row['outcome'] == 'won']
+        to_win = f"{statistics.median(wins):.0f}" if wins else '-'
+        eaten = statistics.mean(row['prey_eaten'] for row in games)
+        print(f"{level:>5} {len(games):>6} {rate['won']:>6.1%} {rate['starved']:>8.1%} {rate['wolf']:>6.1%} "
+              f"{rate['timeout']:>8.1%} {to_win:>13} {eaten:>6.1f}")
+
+        # Mean hunger of the games still going at each sample point
+        curves = [[float(value) for value in row['hunger_curve'].split()] for row in games]
+        points = []
+        for i in range(max(len(curve) for curve in curves)):
+            alive = [curve[i] for curve in curves if len(curve) > i]
+            points.append(f"{i * sample_every}:{statistics.mean(alive):.0f}")
+        print(f"      hunger by tick: {' '.join(points[:12])}{' ...' if len(points) > 12 else ''}")
+
+
+def parse_balance(settings):
+    balance = {}
+    for setting in settings:
+        key, _, value = setting.partition('=')
+        if key not in game.DEFAULT_BALANCE:
+            raise SystemExit(f"Unknown balance setting {key!r}, expected one of {', '.join(game.DEFAULT_BALANCE)}")
+        kind = type(game.DEFAULT_BALANCE[key])
+        try:
+            balance[key] = kind(value)
+        except ValueError:
+            expected = 'a whole number' if kind is int else 'a number'
+            raise SystemExit(f"Bad value {value!r} for {key}, expected {expected}")
+    return balance
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--games', type=int, default=1000, help="games per level")
+    parser.add_argument('--levels', type=int, nargs='+', default=list(range(1, game.LEVELS + 1)))
+    parser.add_argument('--policy', default='hunter')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--seed', type=int, default=0, help="first seed; game i of level L uses seed + L*10^6 + i")
+    parser.add_argument('--max-ticks', type=int, default=3000)
+    parser.add_argument('--sample-every', type=int, default=25, help="ticks between hunger samples")
+    parser.add_argument('--chunk-size', type=int, default=25, help="games handed to a worker at a time")
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE',
+                        help="override a DEFAULT_BALANCE value, e.g. move_chance=0.4")
+    parser.add_argument('--out', default='batch_results.csv')
+    args = parser.parse_args(argv)
+
+    balance = parse_balance(args.set)
+    load_policy(args.policy)  # fail here rather than in every worker
+    games = [(level, args.seed + level * 10 ** 6 + i) for level in args.levels for i in range(args.games)]
+    chunks = [games[i:i + args.chunk_size] for i in range(0, len(games), args.chunk_size)]
+
+    rows = []
+    start = time.perf_counter()
+    with open(args.out, 'w', newline='') as out, ProcessPoolExecutor(args.workers) as pool:
+        writer = csv.DictWriter(out, FIELDS)
+        writer.writeheader()
+        futures = [pool.submit(play_batch, chunk, args.policy, balance, args.max_ticks, args.sample_every)
+                   for chunk in chunks]
+        for done, future in enumerate(as_completed(futures), 1):
+            batch = future.result()
+            writer.writerows(batch)
+            out.flush()  # results land on disk as they come in
+            rows.extend(batch)
+            print(f"\r{len(rows)}/{len(games)} games", end='', file=sys.stderr)
+    elapsed = time.perf_counter() - start
+    print(file=sys.stderr)
+
+    summarize(rows, args.sample_every)
+    rate = len(rows) / elapsed
+    print(f"\n{len(rows)} games in {elapsed:.1f}s: {rate:.0f} games/s, "
+          f"{rate / args.workers:.0f} games/s per core ({args.workers} workers), results in {args.out}")
+
+
+if __name__ == "__main__":
+    main()
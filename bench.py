@@ -0,0 +1,763 @@
+"""Benchmarks for the World hot paths.
+
+`python bench.py` compares the current data structures against the ones they
+replaced. `python bench.py suite` runs every hot path over a grid of map sizes,
+animal counts and wolf counts with fixed seeds and reports ops/sec:
+
+    python bench.py suite --save baseline.json       # remember this machine's numbers
+    python bench.py suite --baseline baseline.json   # flag anything that got slower
+
+Nothing here needs a terminal or the keyboard library.
+"""
+import argparse
+import gc
+import io
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from array import array
+from collections import deque
+from itertools import cycle, islice
+
+import game
+
+HERO = ('Batman', '🦇')
+
+
+class RescanWorld(game.World):
+    """World that recomputes every neighborhood on each probe, like before the tables"""
+    def is_near_wall(self, x, y):
+        return self._scan_near_wall(x, y)
+
+    def is_walkable(self, x, y):
+        return (0 <= x < self.width and 0 <= y < self.height and
+                self.tile_at(x, y) == game.AIR and
+                not self._scan_near_wall(x, y))
+
+    def get_move_targets(self, x, y):
+        targets = 0
+        for i, (dx, dy) in enumerate(game.DIRECTIONS):
+            if self.is_walkable(x + dx, y + dy):
+                targets |= 1 << i
+        return targets
+
+
+def legacy_generate_world(world):
+    """generate_world as it was when the map was a list of lists of glyph strings"""
+    rows = [[world.blocks['air'] for _ in range(world.width)] for _ in range(world.height)]
+    ground_height = world.height - 3
+    for x in range(world.width):
+        current_height = ground_height + world.rng.randint(-1, 1)
+        for y in range(current_height, world.height):
+            rows[y][x] = world.blocks['grass']
+        if world.rng.random() < 0.1 and current_height > 0:
+            rows[current_height - 1][x] = world.blocks['tree']
+        if world.rng.random() < 0.2:
+            rows[current_height][x] = world.blocks['stone']
+    return rows
+
+
+def legacy_is_position_free(world, rows, x, y):
+    if (x < 0 or x >= world.width or y < 0 or y >= world.height or
+            rows[y][x] != world.blocks['air']):
+        return False
+    if world.occupancy.at(x, y) is not None:
+        return False
+    return not (x == world.player_pos[0] and y == world.player_pos[1])
+
+
+def make_world(world_class, width, height, animals, seed=1, **options):
+    world = world_class(width=width, height=height, hero=HERO, seed=seed, clock=game.TickClock(),
+                        **options)
+    world.spawn_animals(animals, 'rabbit', speed=1)
+    return world
+
+
+def time_ticks(world, ticks):
+    start = time.perf_counter()
+    for _ in range(ticks):
+        world.update_animals()
+    return (time.perf_counter() - start) / ticks
+
+
+def bench_tile_map(probes=200000):
+    print("terrain storage: list of lists of glyphs vs bytearray of tile IDs")
+    print(f"{'map':>11} {'layout':>8} {'generate ms':>12} {'map MB':>7} {'probes/s':>10}")
+    for width, height in [(400, 200), (2000, 1000), (4000, 2000)]:
+        world = make_world(game.World, 40, 20, animals=0)
+        world.width, world.height = width, height
+        world.occupancy = game.OccupancyGrid(width, height)
+        cells = [(world.rng.randrange(width), world.rng.randrange(height)) for _ in range(probes)]
+        for layout in ('lists', 'bytes'):
+            generate = legacy_generate_world if layout == 'lists' else game.World.generate_world
+            tracemalloc.start()
+            start = time.perf_counter()
+            terrain = generate(world)
+            elapsed = time.perf_counter() - start
+            size = tracemalloc.get_traced_memory()[0] / 2 ** 20
+            tracemalloc.stop()
+            start = time.perf_counter()
+            if layout == 'lists':
+                for x, y in cells:
+                    legacy_is_position_free(world, terrain, x, y)
+            else:
+                world.world_map = terrain
+                for x, y in cells:
+                    world.is_position_free(x, y)
+            rate = probes / (time.perf_counter() - start)
+            # Generation is timed again untraced, tracemalloc slows allocation down a lot
+            start = time.perf_counter()
+            generate(world)
+            elapsed = time.perf_counter() - start
+            print(f"{width:>5}x{height:<5} {layout:>8} {elapsed * 1000:>12.1f} {size:>7.1f} {rate:>10.0f}")
+
+
+def bench_terrain():
+    if game.np is None:
+        print("noise terrain: skipped, NumPy isn't installed")
+        return
+    print("generate_world plus walkability tables: classic strip vs noise terrain")
+    print(f"{'map':>11} {'terrain':>8} {'generate ms':>12} {'tables ms':>10} {'walkable':>9}")
+    for width, height in [(400, 200), (2000, 1000), (4000, 2000)]:
+        world = make_world(game.World, 40, 20, animals=0)
+        world.width, world.height = width, height
+        for terrain in game.TERRAINS:
+            world.terrain = terrain
+            start = time.perf_counter()
+            world.world_map = world.generate_world()
+            generate = time.perf_counter() - start
+            start = time.perf_counter()
+            world.build_walkability()
+            tables = time.perf_counter() - start
+            walkable = world.walkable.count(1) / len(world.walkable)
+            print(f"{width:>5}x{height:<5} {terrain:>8} {generate * 1000:>12.1f} {tables * 1000:>10.1f} "
+                  f"{walkable:>9.0%}")
+
+
+def bench_walkability(ticks=20):
+    print("update_animals per tick: neighborhood rescans vs walkability tables")
+    print(f"{'map':>11} {'animals':>8} {'rescan ms':>10} {'tables ms':>10} {'speedup':>8}")
+    for width, height, animals in [(40, 20, 10), (400, 200, 2000), (2000, 1000, 20000)]:
+        rescan = time_ticks(make_world(RescanWorld, width, height, animals), ticks)
+        tables = time_ticks(make_world(game.World, width, height, animals), ticks)
+        print(f"{width:>5}x{height:<5} {animals:>8} {rescan * 1000:>10.2f} {tables * 1000:>10.2f} "
+              f"{rescan / tables:>7.1f}x")
+
+
+def bench_entity_store(ticks=10):
+    if game.np is None:
+        print("update_animals with the array entity store: skipped, NumPy isn't installed")
+        return
+    print("update_animals per tick: Entity objects vs array entity store")
+    print(f"{'map':>11} {'animals':>8} {'objects ms':>11} {'arrays ms':>10} {'speedup':>8}")
+    for width, height, animals in [(400, 200, 10000), (2000, 1000, 10000), (2000, 1000, 100000)]:
+        objects = time_ticks(make_world(game.World, width, height, animals), ticks)
+        arrays = time_ticks(make_world(game.World, width, height, animals, entity_store=True), ticks)
+        print(f"{width:>5}x{height:<5} {animals:>8} {objects * 1000:>11.2f} {arrays * 1000:>10.2f} "
+              f"{objects / arrays:>7.1f}x")
+
+
+def place_near_player(world, count, species, radius=40):
+    """Drop animals on free walkable cells around the player, where the chasing happens"""
+    px, py = world.player_pos
+    placed = 0
+    while placed < count:
+        x = world.rng.randint(max(0, px - radius), min(world.width - 1, px + radius))
+        y = world.rng.randint(max(0, py - radius), min(world.height - 1, py + radius))
+        if world.is_walkable(x, y) and world.is_position_free(x, y):
+            world.add_entity(game.Entity(x, y, species))
+            placed += 1
+
+
+def bench_pathfinding(ticks=50):
+    print("update_animals per tick with the player moving every tick: greedy wolves vs distance field")
+    print(f"{'map':>11} {'wolves':>7} {'greedy ms':>10} {'field ms':>9} {'ms/wolf':>8} {'searches':>9}")
+    for width, height in [(400, 200), (2000, 1000)]:
+        for wolves in (1, 10, 100):
+            results = []
+            for pathfinding in (False, True):
+                world = make_world(game.World, width, height, animals=0, pathfinding=pathfinding)
+                place_near_player(world, wolves, game.WOLF)
+                start = time.perf_counter()
+                for tick in range(ticks):
+                    world.game_over = False  # keep the wolves chasing after a catch
+                    world.player_pos[0] += 1 if tick // 5 % 2 else -1
+                    world.update_animals()
+                results.append((time.perf_counter() - start) / ticks)
+            greedy, field = results
+            print(f"{width:>5}x{height:<5} {wolves:>7} {greedy * 1000:>10.3f} {field * 1000:>9.3f} "
+                  f"{field * 1000 / wolves:>8.3f} {world.distance_field.builds:>9}")
+
+
+def walk_right(world, steps):
+    # Draw every step so new terrain keeps coming into view, like a player exploring
+    for _ in range(steps):
+        world.player_pos[0] = min(world.width - 1, world.player_pos[0] + 1)
+        world.update_animals()
+        world.compose_map()
+
+
+def bench_chunked(steps=1000):
+    print("startup and memory: whole map up front vs chunks made on demand")
+    print(f"{'world':>30} {'startup ms':>11} {'walk ms/step':>13} {'peak MB':>8} {'chunks':>7}")
+    for world_class, width, height in [(game.World, 2000, 1000),
+                                       (game.ChunkedWorld, 2000, 1000),
+                                       (game.ChunkedWorld, 10 ** 9, 1000)]:
+        start = time.perf_counter()
+        world = make_world(world_class, width, height, animals=0)
+        startup = time.perf_counter() - start
+        start = time.perf_counter()
+        walk_right(world, steps)
+        walk = (time.perf_counter() - start) / steps
+
+        # Memory in a second run, since tracing allocations skews the timings
+        tracemalloc.start()
+        world = make_world(world_class, width, height, animals=0)
+        walk_right(world, steps)
+        peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+        resident = len(world.world_map.chunks) if world_class is game.ChunkedWorld else '-'
+        label = f"{world_class.__name__} {width}x{height}"
+        print(f"{label:>30} {startup * 1000:>11.1f} {walk * 1000:>13.3f} {peak:>8.1f} {resident:>7}")
+
+
+def bench_rendering(frames=200):
+    print("draw: clear-and-reprint vs differential renderer")
+    print(f"{'map':>11} {'mode':>8} {'bytes/frame':>12} {'frames/s':>10}")
+    for width, height in [(40, 20), (200, 60)]:
+        for mode in ('full', 'diff'):
+            world = make_world(game.World, width, height, animals=width // 4)
+            screen = game.TerminalRenderer(io.StringIO())
+            start = time.perf_counter()
+            for tick in range(frames):
+                world.step(('left', 'right')[tick // 10 % 2])
+                if mode == 'full':
+                    screen.reset()  # what os.system('clear') plus a full reprint amounted to
+                world.draw(screen)
+            elapsed = time.perf_counter() - start
+            stats = screen.stats()
+            print(f"{width:>5}x{height:<5} {mode:>8} {stats['bytes_per_frame']:>12.0f} {frames / elapsed:>10.0f}")
+
+
+def bench_camera(frames=100):
+    print("draw per frame while walking: whole map vs a 72x20 camera window")
+    print(f"{'map':>11} {'view':>8} {'ms/frame':>9} {'bytes/frame':>12} {'row rebuilds':>13}")
+    for width, height in [(40, 20), (400, 200), (2000, 1000)]:
+        for view in ('whole', 'camera'):
+            world = make_world(game.World, width, height, animals=width * height // 200)
+            if view == 'camera':
+                world.camera = game.Camera(72, 20)
+            screen = game.TerminalRenderer(io.StringIO())
+            elapsed = 0.0
+            for frame in range(frames):
+                world.move_player((-1, 1)[frame // 10 % 2], 0)
+                start = time.perf_counter()
+                world.draw(screen)
+                elapsed += time.perf_counter() - start
+            stats = screen.stats()
+            print(f"{width:>5}x{height:<5} {view:>8} {elapsed / frames * 1000:>9.3f} "
+                  f"{stats['bytes_per_frame']:>12.0f} {world.camera.rebuilds:>13}")
+
+
+# The suite: each case_* function builds its world from a fixed seed and returns
+# run(n), which does the operation n times and returns the seconds it took.
+
+SUITE_SEED = 2024
+SUITE_SIZES = [(40, 20), (200, 100), (1000, 500), (2000, 1000)]
+SUITE_ANIMALS = [10, 100, 1000]
+SUITE_WOLVES = [1, 10]
+SUITE = []  # (name, unit, parameters it varies, case function)
+
+
+def suite_case(unit, *params):
+    def register(case):
+        SUITE.append((case.__name__[len('case_'):], unit, params, case))
+        return case
+    return register
+
+
+def suite_world(width, height, animals=0, wolves=0):
+    """Fixed-seed world with exactly these animals: prey anywhere, wolves around the player"""
+    world = game.World(width=width, height=height, hero=HERO, seed=SUITE_SEED, clock=game.TickClock())
+    for animal in list(world.animals):
+        world.remove_entity(animal)
+    world.spawn_animals(animals - animals // 2, 'rabbit')
+    world.spawn_animals(animals // 2, 'squirrel')
+    place_near_player(world, wolves, game.WOLF)
+    return world
+
+
+def probe_cells(world, count=10000):
+    rng = random.Random(SUITE_SEED)
+    return [(rng.randrange(world.width), rng.randrange(world.height)) for _ in range(count)]
+
+
+@suite_case('maps', 'size')
+def case_generate_world(width, height):
+    world = suite_world(width, height)
+
+    def run(n):
+        start = time.perf_counter()
+        for _ in range(n):
+            world.generate_world()
+        return time.perf_counter() - start
+    return run
+
+
+@suite_case('batches', 'size', 'animals')
+def case_spawn_animals(width, height, animals):
+    world = suite_world(width, height)
+
+    def run(n):
+        elapsed = 0.0
+        for _ in range(n):
+            world.clear_animals()
+            start = time.perf_counter()
+            world.spawn_animals(animals, 'rabbit', speed=1)
+            elapsed += time.perf_counter() - start
+        return elapsed
+    return run
+
+
+@suite_case('ticks', 'size', 'animals', 'wolves')
+def case_update_animals(width, height, animals, wolves):
+    world = suite_world(width, height, animals, wolves)
+
+    def run(n):
+        start = time.perf_counter()
+        for _ in range(n):
+            world.game_over = False  # keep the wolves chasing after a catch
+            world.update_animals()
+        return time.perf_counter() - start
+    return run
+
+
+@suite_case('moves', 'size', 'wolves')
+def case_move_wolf(width, height, wolves):
+    world = suite_world(width, height, wolves=wolves)
+    pack = list(world.occupancy.of_kind(game.WOLF.id))
+    # The player shuffles between two cells so the distance field is redone every round
+    px, py = world.player_pos
+    side = px + 1 if world.tile_at(px + 1, py) == game.AIR else px - 1
+    spots = cycle([[side, py], [px, py]])
+
+    def run(n):
+        start = time.perf_counter()
+        for i, wolf in enumerate(islice(cycle(pack), n)):
+            if i % len(pack) == 0:
+                world.player_pos = next(spots)
+            world.move_wolf(wolf)
+        return time.perf_counter() - start
+    return run
+
+
+@suite_case('probes', 'size', 'animals')
+def case_is_position_free(width, height, animals):
+    world = suite_world(width, height, animals)
+    cells = probe_cells(world)
+
+    def run(n):
+        is_position_free = world.is_position_free
+        start = time.perf_counter()
+        for x, y in islice(cycle(cells), n):
+            is_position_free(x, y)
+        return time.perf_counter() - start
+    return run
+
+
+@suite_case('probes', 'size')
+def case_is_near_wall(width, height):
+    world = suite_world(width, height)
+    cells = probe_cells(world)
+
+    def run(n):
+        is_near_wall = world.is_near_wall
+        start = time.perf_counter()
+        for x, y in islice(cycle(cells), n):
+            is_near_wall(x, y)
+        return time.perf_counter() - start
+    return run
+
+
+@suite_case('attempts', 'size', 'animals')
+def case_eat_nearby_animal(width, height, animals):
+    world = suite_world(width, height, animals)
+    px, py = world.player_pos
+    spot = next((px + dx, py + dy) for dx, dy in game.DIRECTIONS
+                if world.tile_at(px + dx, py + dy) == game.AIR and world.occupancy.at(px + dx, py + dy) is None)
+    prey = world.add_entity(game.Entity(*spot, game.RABBIT))
+
+    def run(n):
+        elapsed = 0.0
+        for _ in range(n):
+            world.player_hunger = 50
+            start = time.perf_counter()
+            eaten = world.eat_nearby_animal()
+            elapsed += time.perf_counter() - start
+            # Put the rabbit back next to the player for the next attempt
+            if eaten:
+                world.add_entity(prey)
+            elif (prey.x, prey.y) != spot:
+                world.move_entity(prey, *spot)
+        return elapsed
+    return run
+
+
+@suite_case('huffs', 'size', 'wolves')
+def case_huff_and_puff(width, height, wolves):
+    world = suite_world(width, height, wolves=wolves)
+    pack = list(world.occupancy.of_kind(game.WOLF.id))
+    homes = [(wolf.x, wolf.y) for wolf in pack]
+
+    def run(n):
+        elapsed = 0.0
+        for _ in range(n):
+            world.player_hunger = 100
+            start = time.perf_counter()
+            world.huff_and_puff()
+            elapsed += time.perf_counter() - start
+            # Walk the pack back to where it started
+            for wolf in pack:
+                world.remove_entity(wolf)
+            for wolf, (x, y) in zip(pack, homes):
+                wolf.x, wolf.y = x, y
+                world.add_entity(wolf)
+        return elapsed
+    return run
+
+
+@suite_case('frames', 'size', 'animals')
+def case_draw(width, height, animals):
+    world = suite_world(width, height, animals)
+    screen = game.TerminalRenderer(io.StringIO())
+    world.draw(screen)  # the first frame is a full paint, the rest are diffs
+
+    def run(n):
+        elapsed = 0.0
+        for _ in range(n):
+            world.update_animals()
+            screen.out.seek(0)
+            screen.out.truncate()
+            start = time.perf_counter()
+            world.draw(screen)
+            elapsed += time.perf_counter() - start
+        return elapsed
+    return run
+
+
+@suite_case('loads', 'size', 'animals')
+def case_load(width, height, animals):
+    world = suite_world(width, height, animals, wolves=1)
+    for _ in range(10):
+        world.step(None)
+    folder = tempfile.TemporaryDirectory()
+    path = os.path.join(folder.name, 'suite.sav')
+    world.save(path)
+    expected = world.state_hash()
+
+    def run(n):
+        elapsed = 0.0
+        for _ in range(n):
+            start = time.perf_counter()
+            loaded = game.World.load(path)
+            elapsed += time.perf_counter() - start
+            # A save has to round-trip exactly, or replays and checkpoints drift
+            if loaded.state_hash() != expected:
+                raise RuntimeError(f"{width}x{height} world with {animals} animals "
+                                   "loads with a different state hash")
+        return elapsed
+    run.folder = folder  # the save is deleted once the case is done with
+    return run
+
+
+def suite_params(params, sizes):
+    """Every combination of the parameters a case varies, skipping maps too small to hold the animals"""
+    grid = [{'width': width, 'height': height} for width, height in sizes]
+    for name, values in (('animals', SUITE_ANIMALS), ('wolves', SUITE_WOLVES)):
+        if name in params:
+            grid = [dict(point, **{name: value}) for point in grid for value in values]
+    return [point for point in grid if point.get('animals', 0) * 4 <= point['width'] * point['height']]
+
+
+def measure(run, min_time, repeat):
+    """Best ops/sec over `repeat` runs long enough to take min_time each"""
+    n = 1
+    elapsed = run(n)
+    while elapsed < min_time:
+        n = max(n * 2, int(n * min_time / max(elapsed, 1e-9) * 1.2))
+        elapsed = run(n)
+    best = min([elapsed] + [run(n) for _ in range(repeat - 1)])
+    return n / best
+
+
+def result_key(name, point):
+    key = f"{name} {point['width']}x{point['height']}"
+    for param in ('animals', 'wolves'):
+        if param in point:
+            key += f" {param}={point[param]}"
+    return key
+
+
+def scaling(points, rates, param):
+    """Median log-log slope of time per op against one parameter, the others held fixed"""
+    def value(point):
+        return point['width'] * point['height'] if param == 'cells' else point[param]
+
+    varied = ('width', 'height') if param == 'cells' else (param,)
+    groups = {}
+    for point, rate in zip(points, rates):
+        rest = tuple(sorted((k, v) for k, v in point.items() if k not in varied))
+        groups.setdefault(rest, []).append((math.log(value(point)), -math.log(rate)))
+    slopes = []
+    for series in groups.values():
+        if len(series) < 2:
+            continue
+        mean_x = statistics.mean(x for x, _ in series)
+        mean_y = statistics.mean(y for _, y in series)
+        spread = sum((x - mean_x) ** 2 for x, _ in series)
+        slopes.append(sum((x - mean_x) * (y - mean_y) for x, y in series) / spread)
+    return statistics.median(slopes) if slopes else None
+
+
+def run_suite(sizes, only=(), min_time=0.2, repeat=3, baseline=None, tolerance=0.25):
+    """Run the suite, print a table per case, return ({key: ops/sec}, [regressed keys])"""
+    results = {}
+    regressions = []
+    for name, unit, params, case in SUITE:
+        if only and name not in only:
+            continue
+        points = suite_params(params, sizes)
+        print(f"{name} ({unit}/s)")
+        print(f"{'map':>11} {'animals':>8} {'wolves':>7} {'ops/s':>12} {'us/op':>10} {'vs baseline':>12}")
+        rates = []
+        for point in points:
+            rate = measure(case(**point), min_time, repeat)
+            rates.append(rate)
+            key = result_key(name, point)
+            results[key] = rate
+            versus = ''
+            if baseline and key in baseline:
+                change = rate / baseline[key] - 1
+                versus = f"{change:+.0%}"
+                if change < -tolerance:
+                    versus += ' SLOWER'
+                    regressions.append(key)
+            print(f"{point['width']:>5}x{point['height']:<5} {point.get('animals', '-'):>8} "
+                  f"{point.get('wolves', '-'):>7} {rate:>12.0f} {1e6 / rate:>10.2f} {versus:>12}")
+        curve = []
+        for param in ('cells', 'animals', 'wolves'):
+            if param == 'cells' or param in params:
+                slope = scaling(points, rates, param)
+                if slope is not None:
+                    curve.append(f"{param}^{slope:.2f}")
+        if curve:
+            print(f"  time per op grows like {', '.join(curve)}")
+        print()
+    return results, regressions
+
+
+def suite_main(args):
+    sizes = SUITE_SIZES[:2] if args.quick else SUITE_SIZES
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+    results, regressions = run_suite(sizes, args.only, args.min_time, args.repeat, baseline, args.tolerance)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(),
+                       'seed': SUITE_SEED, 'results': results}, f, indent=1, sort_keys=True)
+        print(f"saved {len(results)} results to {args.save}")
+    if regressions:
+        print(f"{len(regressions)} cases more than {args.tolerance:.0%} slower than {args.baseline}:")
+        for key in regressions:
+            print(f"  {key}")
+        return 1
+    return 0
+
+
+# Bytes a steady-state tick may have allocated at its peak, and may leave behind over
+# a whole run, before `python bench.py allocations` fails. The peak catches anything
+# a tick builds per animal or keeps for the whole tick (a list of animals, a fresh
+# map copy, a dict of movers); short-lived ints and floats fit well under it.
+ALLOCATION_BUDGETS = {
+    'tick': (1024, 4096),
+    'sparse tick': (2048, 4096),  # SparseOccupancy's dict is rebuilt as animals come and go
+    'frame': (16384, 16384),  # the output, HUD text and CellWidths entries for new HUD lines
+}
+
+
+class NullOut:
+    """Terminal stand-in that throws frames away"""
+    def write(self, text):
+        pass
+
+    def flush(self):
+        pass
+
+
+def allocation_worlds():
+    """Steady-state scenarios as (name, budget, step function), the player standing still"""
+    crowded = make_world(game.World, 200, 100, animals=3000)
+    place_near_player(crowded, 20, game.WOLF)
+    yield 'crowded 200x100 tick', 'tick', crowded.step
+    level = game.World(level=2, hero=HERO, seed=1, clock=game.TickClock())
+    yield 'level 2 tick', 'tick', level.step
+    chunked = make_world(game.ChunkedWorld, 100000, 200, animals=0)
+    yield 'chunked tick', 'sparse tick', chunked.step
+    drawn = game.World(hero=HERO, seed=2, clock=game.TickClock())
+    screen = game.TerminalRenderer(NullOut())
+
+    def step_and_draw():
+        drawn.step()
+        drawn.draw(screen)
+    yield 'tick + frame', 'frame', step_and_draw
+
+
+def trace_ticks(step, ticks, warmup=50):
+    """tracemalloc peak of every tick and net growth over all of them, plus gen 0 collections"""
+    for _ in range(warmup):
+        step()  # scratch buffers, caches and the first full paint
+    peaks = array('q', bytes(8 * ticks))  # allocated before tracing so it isn't counted
+    collections = gc.get_stats()[0]['collections']
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    for tick in range(ticks):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        step()  # a world whose game has ended keeps ticking, which is all this is about
+        peaks[tick] = tracemalloc.get_traced_memory()[1] - before
+    growth = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return sorted(peaks), growth, gc.get_stats()[0]['collections'] - collections
+
+
+def check_allocations(ticks=500):
+    """Fail (return 1) if a steady-state tick allocates more than ALLOCATION_BUDGETS allows"""
+    print("steady-state allocations (tracemalloc, bytes)")
+    print(f"{'scenario':>22} {'ticks':>6} {'peak p50':>9} {'peak max':>9} {'budget':>7} {'growth':>7} "
+          f"{'budget':>7} {'gc runs':>8}")
+    failed = []
+    for name, budget, step in allocation_worlds():
+        peaks, growth, collections = trace_ticks(step, ticks)
+        peak_budget, growth_budget = ALLOCATION_BUDGETS[budget]
+        over = peaks[-1] > peak_budget or growth > growth_budget
+        print(f"{name:>22} {len(peaks):>6} {peaks[len(peaks) // 2]:>9} {peaks[-1]:>9} {peak_budget:>7} "
+              f"{growth:>7} {growth_budget:>7} {collections:>8}{'  OVER BUDGET' if over else ''}")
+        if over:
+            failed.append(name)
+    if failed:
+        print(f"over the allocation budget: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+REACHABLE_SIZES = [(40, 20), (200, 100), (400, 200)]
+REACHABLE_SEEDS = range(20)
+
+
+def walkable_from_player(world):
+    """Set of cells the player can walk to, by a plain breadth-first search over AIR tiles"""
+    width, height = world.width, world.height
+    start = world.player_pos[1] * width + world.player_pos[0]
+    seen = {start}
+    queue = deque([start])
+    while queue:
+        cell = queue.popleft()
+        y, x = divmod(cell, width)
+        for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+            neighbor = ny * width + nx
+            if (0 <= nx < width and 0 <= ny < height and neighbor not in seen and
+                    world.tile_at(nx, ny) == game.AIR):
+                seen.add(neighbor)
+                queue.append(neighbor)
+    return seen
+
+
+def check_reachable(ticks=30):
+    """Fail (return 1) if a noise map puts prey where the player can't get to, at the start or after some ticks"""
+    print("prey the player can't reach on noise terrain")
+    print(f"{'map':>9} {'seeds':>6} {'prey':>6} {'unreachable':>12}")
+    failed = []
+    for width, height in REACHABLE_SIZES:
+        prey = unreachable = 0
+        for seed in REACHABLE_SEEDS:
+            world = game.World(width=width, height=height, hero=HERO, seed=seed, clock=game.TickClock(),
+                               terrain='noise')
+            # Plenty of prey, so a sealed cave anywhere on the map would get some
+            world.spawn_animals(len(world.spawn_cells()) // 10, 'rabbit')
+            reachable = walkable_from_player(world)
+            for tick in range(ticks + 1):
+                if tick:
+                    world.update_animals()
+                if tick and tick != ticks:
+                    continue
+                for animal in world.animals:
+                    if game.SPECIES[animal.species].prey:
+                        prey += 1
+                        if animal.y * width + animal.x not in reachable:
+                            unreachable += 1
+                            failed.append(f"{width}x{height} seed {seed} tick {tick}: "
+                                          f"{animal.symbol} at ({animal.x}, {animal.y})")
+        print(f"{width:>4}x{height:<4} {len(REACHABLE_SEEDS):>6} {prey:>6} {unreachable:>12}")
+    if failed:
+        print(f"{len(failed)} prey out of reach, first ones:")
+        for line in failed[:10]:
+            print(f"  {line}")
+        return 1
+    return 0
+
+
+def compare_designs():
+    bench_tile_map()
+    print()
+    bench_terrain()
+    print()
+    bench_walkability()
+    print()
+    bench_entity_store()
+    print()
+    bench_pathfinding()
+    print()
+    bench_chunked()
+    print()
+    bench_rendering()
+    print()
+    bench_camera()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="World benchmarks")
+    parser.add_argument('what', nargs='?', choices=['designs', 'suite', 'allocations', 'reachable'],
+                        default='designs',
+                        help="old-vs-new design comparisons (default), the hot path suite, the steady-state "
+                             "allocation budget check, or the check that noise maps only put prey within reach")
+    parser.add_argument('--quick', action='store_true', help="suite: only the two smallest maps")
+    parser.add_argument('--only', nargs='+', default=[], metavar='CASE',
+                        help=f"suite: just these cases ({', '.join(name for name, *_ in SUITE)})")
+    parser.add_argument('--min-time', type=float, default=0.2, help="suite: seconds per timing run")
+    parser.add_argument('--repeat', type=int, default=3, help="suite: timing runs per case, best one counts")
+    parser.add_argument('--save', metavar='FILE', help="suite: write results as a baseline JSON")
+    parser.add_argument('--baseline', metavar='FILE', help="suite: compare against a saved baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="suite: slowdown vs the baseline that counts as a regression")
+    args = parser.parse_args(argv)
+    if args.what == 'suite':
+        return suite_main(args)
+    if args.what == 'allocations':
+        return check_allocations()
+    if args.what == 'reachable':
+        return check_reachable()
+    compare_designs()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
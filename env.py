@@ -0,0 +1,173 @@
+"""Many worlds stepped in lockstep behind a gym-style API, for training automated players.
+
+    env = VecEnv(64)
+    obs = env.reset(seed=1)
+    obs, rewards, terminated, truncated, info = env.step(actions)  # one action index per world
+
+Actions index game.RECORDED_ACTIONS (0 waits, then up, down, left, right, eat,
+huff). Observations are NumPy arrays shared across steps, so copy them if you
+keep them:
+
+    tiles    (N, height, width) uint8   terrain tile IDs (game.AIR, GRASS, TREE, STONE)
+    animals  (N, species, height, width) uint8   1 where an animal of that species id stands
+    player   (N, 2) int32   x, y
+    hunger   (N,) float32   0-100
+
+A world that finishes is reset straight away with the next seed, and the obs
+returned for it is the new game's first; info says how the old one ended.
+
+    python env.py                     # steps/s for 1, 64 and 1024 worlds
+    python env.py --worlds 256 --steps 2000
+"""
+import argparse
+import random
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import game
+
+HERO = ('Batman', '🦇')
+# Reward per prey eaten, per wolf within WOLF_RANGE of the player, and for getting caught or starving
+REWARDS = {'prey': 1.0, 'wolf_near': -0.05, 'death': -5.0}
+WOLF_RANGE = 3  # the same distance the HUD warns at
+
+
+class VecEnv:
+    """N Worlds with the same size and options, reset and stepped together"""
+    def __init__(self, num_worlds, width=40, height=20, level=1, max_ticks=1000, rewards=None,
+                 **world_options):
+        if np is None:
+            raise ImportError("The training environment needs NumPy: pip install numpy")
+        self.num_worlds = num_worlds
+        self.width = width
+        self.height = height
+        self.level = level
+        self.max_ticks = max_ticks
+        self.rewards = dict(REWARDS, **(rewards or {}))
+        self.world_options = world_options
+        self.actions = game.RECORDED_ACTIONS
+        self.worlds = [None] * num_worlds
+        self.seeds = random.Random()
+
+        # Everything step() hands back, allocated once and filled in place
+        self.obs = {
+            'tiles': np.zeros((num_worlds, height, width), dtype=np.uint8),
+            'animals': np.zeros((num_worlds, len(game.SPECIES), height, width), dtype=np.uint8),
+            'player': np.zeros((num_worlds, 2), dtype=np.int32),
+            'hunger': np.zeros(num_worlds, dtype=np.float32),
+        }
+        self.reward = np.zeros(num_worlds, dtype=np.float32)
+        self.terminated = np.zeros(num_worlds, dtype=bool)
+        self.truncated = np.zeros(num_worlds, dtype=bool)
+        self.info = {
+            'status': np.full(num_worlds, 'playing', dtype='<U8'),  # how the last step ended each game
+            'ticks': np.zeros(num_worlds, dtype=np.int32),  # length of the game that just ended
+            'seed': np.zeros(num_worlds, dtype=np.int64),  # seed of the game now running
+        }
+        self.terrain_versions = [None] * num_worlds
+        self.wolves = [species.id for species in game.SPECIES if species.behavior == 'hunt']
+        self.steps = 0
+
+    def reset(self, seed=None):
+        """Start a fresh game in every world; the same seed gives the same games"""
+        self.seeds.seed(seed)
+        for i in range(self.num_worlds):
+            self._new_world(i)
+        self.info['status'][:] = 'playing'
+        self.info['ticks'][:] = 0
+        return self.obs
+
+    def _new_world(self, i):
+        seed = self.seeds.getrandbits(63)
+        self.worlds[i] = game.World(width=self.width, height=self.height, level=self.level, hero=HERO,
+                                    seed=seed, clock=game.TickClock(), **self.world_options)
+        self.info['seed'][i] = seed
+        self.terrain_versions[i] = None
+        self._observe(i)
+
+    def _observe(self, i):
+        world = self.worlds[i]
+        if world.terrain_version != self.terrain_versions[i]:
+            tiles = np.frombuffer(world.world_map, dtype=np.uint8)
+            self.obs['tiles'][i] = tiles.reshape(self.height, self.width)
+            self.terrain_versions[i] = world.terrain_version
+        channels = self.obs['animals'][i]
+        channels.fill(0)
+        animals = world.animals
+        if animals:
+            channels[[animal.species for animal in animals],
+                     [animal.y for animal in animals],
+                     [animal.x for animal in animals]] = 1
+        self.obs['player'][i] = world.player_pos
+        self.obs['hunger'][i] = world.player_hunger
+
+    def step(self, actions):
+        """Apply one action per world and tick them all once.
+
+        Returns (obs, rewards, terminated, truncated, info), each with one entry per world.
+        """
+        if len(actions) != self.num_worlds:
+            raise ValueError(f"Expected {self.num_worlds} actions, got {len(actions)}")
+        rewards = self.rewards
+        names = self.actions
+        for i, action in enumerate(actions.tolist() if hasattr(actions, 'tolist') else actions):
+            world = self.worlds[i]
+            prey_before = world.prey_remaining()
+            result = world.step(names[action])
+            px, py = world.player_pos
+            wolves_near = sum(1 for wolf in self.wolves
+                              for _ in world.occupancy.near(px, py, WOLF_RANGE, wolf))
+            dead = result.status == 'caught' or result.status == 'starved'
+            self.reward[i] = (rewards['prey'] * (prey_before - world.prey_remaining()) +
+                              rewards['wolf_near'] * wolves_near + rewards['death'] * dead)
+            self.terminated[i] = result.status != 'playing'
+            self.truncated[i] = not self.terminated[i] and world.ticks >= self.max_ticks
+            self.info['status'][i] = result.status
+            if self.terminated[i] or self.truncated[i]:
+                self.info['ticks'][i] = world.ticks
+                self._new_world(i)
+            else:
+                self._observe(i)
+        self.steps += 1
+        return self.obs, self.reward, self.terminated, self.truncated, self.info
+
+
+def bench(worlds, steps, seed=0):
+    """World-steps per second with random actions"""
+    env = VecEnv(worlds)
+    env.reset(seed)
+    rng = np.random.default_rng(seed)
+    actions = np.empty(worlds, dtype=np.int64)
+    episodes = 0
+    start = time.perf_counter()
+    for _ in range(steps):
+        actions[:] = rng.integers(0, len(env.actions), worlds)
+        _, _, terminated, truncated, _ = env.step(actions)
+        episodes += int(terminated.sum() + truncated.sum())
+    elapsed = time.perf_counter() - start
+    return worlds * steps / elapsed, episodes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--worlds', type=int, nargs='+', default=[1, 64, 1024])
+    parser.add_argument('--steps', type=int, default=None,
+                        help="steps per run (default: about 100k world-steps each)")
+    args = parser.parse_args(argv)
+    if np is None:
+        raise SystemExit("The training environment needs NumPy: pip install numpy")
+    print(f"{'worlds':>7} {'steps':>6} {'world-steps/s':>14} {'env steps/s':>12} {'episodes':>9}")
+    for worlds in args.worlds:
+        steps = args.steps or max(100, 100000 // worlds)
+        rate, episodes = bench(worlds, steps)
+        print(f"{worlds:>7} {steps:>6} {rate:>14.0f} {rate / worlds:>12.1f} {episodes:>9}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,161 @@
+import argparse
+import asyncio
+import codecs
+import cProfile
+import gc
+import json
+import mmap
 import os
+import pstats
+import struct
 import random
+import sys
 import time
+import tracemalloc
+import unicodedata
+import zlib
+from array import array
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import compress, count, permutations
+from operator import ne
+
+try:
+    import numpy as np
+except ImportError:  # Only the array entity store and noise terrain need it
+    np = None
+
+# The 8 neighbor steps, in the order animals have always tried them.
+# Bit i of a cell's move_targets entry is set when DIRECTIONS[i] is a legal step.
+DIRECTIONS = [(dx, dy) for dx in [-1, 0, 1] for dy in [-1, 0, 1] if dx != 0 or dy != 0]
+DIRECTION_INDEXES = tuple(range(len(DIRECTIONS)))
+# A shuffle of 8 items swaps item i with item draw_below(i + 1) for i = 7 down to 1; each
+# step here is (i, bits draw_below asks getrandbits for). Animals shuffle a scratch list this way.
+SHUFFLE_STEPS = tuple((i, (i + 1).bit_length()) for i in range(len(DIRECTIONS) - 1, 0, -1))
+SIDESTEPS = (-1, 1)
+STEPS = (-1, 0, 1)
+UNKNOWN_TARGETS = 0x100  # move_targets entry not computed yet
+
+# Terrain is stored as one byte per cell holding one of these tile IDs.
+# Glyphs are only looked up when a frame is drawn.
+AIR, GRASS, TREE, STONE = range(4)
+TILE_GLYPHS = (' ', '▒', '♣', '▓')
+SOLID = (GRASS, STONE)  # what animals keep a cell's distance from
+# For str.translate on terrain bytes decoded as latin-1: tile ID -> glyph
+TILE_TRANSLATION = {tile: glyph for tile, glyph in enumerate(TILE_GLYPHS)}
+
+# Gameplay numbers that balance runs (see batch.py) like to tweak.
+# Pass World(balance={...}) to override some of them for one world.
+DEFAULT_BALANCE = {
+    'move_chance': 0.3,  # chance an animal gets to move each tick
+    'escape_chance': 0.5,  # chance prey slips away when you try to eat it
+    'huff_cost': 20,  # hunger spent on a successful huff and puff
+}
+
+CHASE_RADIUS = 64  # wolves farther than this from the player steer greedily
+FLEE_RADIUS = 6  # prey only notice the player this close
+
+CHUNK_SIZE = 32  # chunked worlds make and evict terrain in squares this big
+
+LEVELS = 2  # levels in a game; level N has N wolves
+
+# Actions accepted by World.step
+ACTIONS = {
+    'up': (0, -1),
+    'down': (0, 1),
+    'left': (-1, 0),
+    'right': (1, 0),
+    'eat': None,
+    'huff': None,
+    'quit': None,
+}
+
+# Actions as stored in a Recording, one byte each: the index in this tuple
+RECORDED_ACTIONS = (None, 'up', 'down', 'left', 'right', 'eat', 'huff')
+MOVES = ('up', 'down', 'left', 'right')
+INPUT_QUEUE = 8  # actions waiting for a tick; when more arrive the oldest go
+
+def queue_action(queue, action, stamp):
+    """Add (action, stamp) to a bounded deque of input waiting for a tick.
+
+    A move right after another queued move takes its place (keeping the older
+    stamp), so holding an arrow key never banks more than one step; when the
+    deque is full the oldest entry goes. Returns 'coalesced', 'dropped' or 'queued'.
+    """
+    if action in MOVES and queue and queue[-1][0] in MOVES:
+        queue[-1] = (action, queue[-1][1])
+        return 'coalesced'
+    dropped = len(queue) == queue.maxlen
+    queue.append((action, stamp))
+    return 'dropped' if dropped else 'queued'
+
+# World.save files: a table of tagged sections, see World.save
+SAVE_MAGIC = b'KPSAVE\r\n'
+SAVE_VERSION = 1  # only bumped when older readers couldn't cope, new fields get new tags or keys
+MMAP_SAVES_OVER = 1 << 20  # bytes; bigger saves are memory-mapped rather than read in
+
+# What World.step reports back after each tick
+StepResult = namedtuple('StepResult', ['tick', 'action', 'status', 'hunger', 'ate', 'huff'])
+
+# Kinds of animal, as data. An entity carries its species' id, the index in SPECIES.
+# behavior is 'wander' (roam, or flee with prey_flee) or 'hunt' (chase the player);
+# prey are what you have to eat to win; hunger_value is what eating one gives back.
+# speed N means an animal takes every Nth move it gets (a rabbit's 5 makes it slow).
+Species = namedtuple('Species', ['id', 'name', 'glyph', 'speed', 'hunger_value', 'behavior', 'prey'])
+SPECIES = []
+SPECIES_BY_NAME = {}
+SPECIES_BY_GLYPH = {}
+
+def register_species(name, glyph, speed, hunger_value, behavior, prey):
+    species = Species(len(SPECIES), name, glyph, speed, hunger_value, behavior, prey)
+    SPECIES.append(species)
+    SPECIES_BY_NAME[name] = species
+    SPECIES_BY_GLYPH[glyph] = species
+    return species
+
+def species_of(kind):
+    """The Species for an id, a name ('wolf') or a glyph ('🐺')"""
+    if isinstance(kind, Species):
+        return kind
+    if isinstance(kind, int):
+        return SPECIES[kind]
+    species = SPECIES_BY_NAME.get(kind) or SPECIES_BY_GLYPH.get(kind)
+    if species is None:
+        raise ValueError(f"Unknown species {kind!r}, expected one of {', '.join(SPECIES_BY_NAME)}")
+    return species
+
+RABBIT = register_species('rabbit', '🐰', speed=5, hunger_value=40, behavior='wander', prey=True)
+SQUIRREL = register_species('squirrel', '🐿️', speed=1, hunger_value=25, behavior='wander', prey=True)
+WOLF = register_species('wolf', '🐺', speed=1, hunger_value=25, behavior='hunt', prey=False)
+
+def draw_below(rng, n):
+    """Random int in range(n), by rejection on getrandbits.
+
+    The same draws CPython's randrange(n) makes, written out with public methods
+    so recordings can't drift with a private helper of the random module.
+    """
+    bits = n.bit_length()
+    value = rng.getrandbits(bits)
+    while value >= n:
+        value = rng.getrandbits(bits)
+    return value
 
 class Entity:
-    def __init__(self, x, y, symbol, speed=1):
+    __slots__ = ('x', 'y', 'species', 'speed', 'move_counter')
+
+    def __init__(self, x, y, species, speed=None):
+        kind = species_of(species)
         self.x = x
         self.y = y
-        self.symbol = symbol
-        self.speed = speed
+        self.species = kind.id
+        self.speed = kind.speed if speed is None else speed
         self.move_counter = 0
 
+    @property
+    def symbol(self):
+        return SPECIES[self.species].glyph
+
     def move_random(self, world):
         self.move_counter += 1
         if self.move_counter < self.speed:
@@ -17,36 +163,920 @@ class Entity:
             
         self.move_counter = 0
         
-        # Try all possible directions in random order
-        directions = [(dx, dy) for dx in [-1, 0, 1] for dy in [-1, 0, 1] if dx != 0 or dy != 0]
-        random.shuffle(directions)
+        # Try all possible directions in random order, shuffled in the world's scratch list
+        order = world.direction_order
+        order[:] = DIRECTION_INDEXES
+        getrandbits = world.rng.getrandbits
+        for i, bits in SHUFFLE_STEPS:
+            j = getrandbits(bits)  # draw_below(i + 1), inlined
+            while j > i:
+                j = getrandbits(bits)
+            order[i], order[j] = order[j], order[i]
+        targets = world.get_move_targets(self.x, self.y)
+        
+        # Skittish prey try the steps that take them furthest from the player first
+        if world.prey_flee and world.distance_field.distance(self.x, self.y, FLEE_RADIUS) >= 0:
+            field = world.distance_field
+            order.sort(key=lambda i: -field.distance(self.x + DIRECTIONS[i][0], self.y + DIRECTIONS[i][1],
+                                                     FLEE_RADIUS + 1))
         
-        for dx, dy in directions:
+        for i in order:
+            # Skip steps into walls without probing the map
+            if not targets >> i & 1:
+                continue
+            dx, dy = DIRECTIONS[i]
             new_x = self.x + dx
             new_y = self.y + dy
             
-            # Check if new position is valid and free      
-            if (world.is_position_free(new_x, new_y, self) and 
-                not world.is_near_wall(new_x, new_y)):
-                self.x = new_x
-                self.y = new_y
+            # Target is walkable, so only other entities can be in the way
+            if world.is_position_free(new_x, new_y, self):
+                world.move_entity(self, new_x, new_y)
                 return  # Successfully moved
         
         # If we get here, no valid move was found - stay in place
 
+class OccupancyGrid:
+    """Grid index of which entity stands on each cell, plus a roster per species"""
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.clear()
+
+    def clear(self):
+        self.cells = [None] * (self.width * self.height)
+        self.by_species = {}  # species id -> {entity: None}, an insertion-ordered set
+
+    def add(self, entity):
+        self.cells[entity.y * self.width + entity.x] = entity
+        self.by_species.setdefault(entity.species, {})[entity] = None
+
+    def remove(self, entity):
+        index = entity.y * self.width + entity.x
+        if self.cells[index] is entity:
+            self.cells[index] = None
+        self.by_species.get(entity.species, {}).pop(entity, None)
+
+    def move(self, entity, x, y):
+        index = entity.y * self.width + entity.x
+        if self.cells[index] is entity:
+            self.cells[index] = None
+        entity.x = x
+        entity.y = y
+        self.cells[y * self.width + x] = entity
+
+    def at(self, x, y):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.cells[y * self.width + x]
+        return None
+
+    def of_kind(self, species):
+        return list(self.by_species.get(species, ()))
+
+    def roster(self, species):
+        """Live entities of one species id without copying; don't add or remove any while looping"""
+        return self.by_species.get(species, ())
+
+    def near(self, x, y, radius, species=None):
+        """Yield entities within `radius` squares of (x, y), optionally only one species id"""
+        left = max(0, x - radius)
+        right = min(self.width - 1, x + radius)
+        top = max(0, y - radius)
+        bottom = min(self.height - 1, y + radius)
+
+        # A handful of wolves is cheaper to check directly than a big square
+        roster = self.by_species.get(species, {}) if species is not None else None
+        if roster is not None and len(roster) < (right - left + 1) * (bottom - top + 1):
+            for entity in roster:
+                if left <= entity.x <= right and top <= entity.y <= bottom:
+                    yield entity
+            return
+
+        cells = self.cells
+        for row in range(top, bottom + 1):
+            start = row * self.width
+            for entity in cells[start + left:start + right + 1]:
+                if entity is not None and (species is None or entity.species == species):
+                    yield entity
+
+    def within(self, left, top, right, bottom):
+        """Yield entities with left <= x < right and top <= y < bottom, in no particular order"""
+        rosters = self.by_species.values()
+        if sum(map(len, rosters)) < (right - left) * (bottom - top):
+            for roster in rosters:
+                for entity in roster:
+                    if left <= entity.x < right and top <= entity.y < bottom:
+                        yield entity
+            return
+        cells = self.cells
+        for row in range(top, bottom):
+            start = row * self.width
+            for entity in cells[start + left:start + right]:
+                if entity is not None:
+                    yield entity
+
+class SparseOccupancy(OccupancyGrid):
+    """OccupancyGrid keyed by cell in a dict, for worlds too big for a flat grid"""
+    def clear(self):
+        self.cells = {}
+        self.by_species = {}
+
+    def add(self, entity):
+        self.cells[entity.y * self.width + entity.x] = entity
+        self.by_species.setdefault(entity.species, {})[entity] = None
+
+    def remove(self, entity):
+        index = entity.y * self.width + entity.x
+        if self.cells.get(index) is entity:
+            del self.cells[index]
+        self.by_species.get(entity.species, {}).pop(entity, None)
+
+    def move(self, entity, x, y):
+        index = entity.y * self.width + entity.x
+        if self.cells.get(index) is entity:
+            del self.cells[index]
+        entity.x = x
+        entity.y = y
+        self.cells[y * self.width + x] = entity
+
+    def at(self, x, y):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.cells.get(y * self.width + x)
+        return None
+
+    def near(self, x, y, radius, species=None):
+        """Yield entities within `radius` squares of (x, y), optionally only one species id"""
+        left = max(0, x - radius)
+        right = min(self.width - 1, x + radius)
+        top = max(0, y - radius)
+        bottom = min(self.height - 1, y + radius)
+        roster = self.by_species.get(species, {}) if species is not None else self.cells.values()
+        if len(roster) < (right - left + 1) * (bottom - top + 1):
+            for entity in roster:
+                if left <= entity.x <= right and top <= entity.y <= bottom:
+                    yield entity
+            return
+        for row in range(top, bottom + 1):
+            for column in range(left, right + 1):
+                entity = self.cells.get(row * self.width + column)
+                if entity is not None and (species is None or entity.species == species):
+                    yield entity
+
+    def within(self, left, top, right, bottom):
+        if len(self.cells) < (right - left) * (bottom - top):
+            for entity in self.cells.values():
+                if left <= entity.x < right and top <= entity.y < bottom:
+                    yield entity
+            return
+        for row in range(top, bottom):
+            for column in range(left, right):
+                entity = self.cells.get(row * self.width + column)
+                if entity is not None:
+                    yield entity
+
+class Missing(dict):
+    """dict that answers -1 for keys it doesn't have"""
+    def __missing__(self, key):
+        return -1
+
+class FreeCells:
+    """Set of cell indexes with O(1) add, discard and uniform random pick.
+
+    The cells sit packed in an array and `slots` maps each one back to its place
+    there (-1 when absent), so taking one out is a swap with the last entry. Pass
+    `size` (cells on the map) for a flat slot table; without it, slots is a dict.
+    """
+    def __init__(self, cells=(), size=None):
+        self.cells = array('i', cells)
+        self.slots = array('i', [-1]) * size if size is not None else Missing()
+        slots = self.slots
+        for slot, cell in enumerate(self.cells):
+            slots[cell] = slot
+
+    @classmethod
+    def of_flags(cls, flags):
+        """FreeCells of every index whose byte in `flags` is 1, in index order"""
+        if np is None:
+            return cls(compress(range(len(flags)), flags), len(flags))
+        # Same result, but a multi-million cell map takes milliseconds instead of a second
+        found = np.flatnonzero(np.frombuffer(flags, dtype=np.uint8) == 1).astype(np.int32)
+        slots = np.full(len(flags), -1, dtype=np.int32)
+        slots[found] = np.arange(found.size, dtype=np.int32)
+        free = cls()
+        free.cells.frombytes(found.tobytes())
+        free.slots = array('i')
+        free.slots.frombytes(slots.tobytes())
+        return free
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __contains__(self, cell):
+        return self.slots[cell] >= 0
+
+    def add(self, cell):
+        if self.slots[cell] < 0:
+            self.slots[cell] = len(self.cells)
+            self.cells.append(cell)
+
+    def discard(self, cell):
+        slot = self.slots[cell]
+        if slot >= 0:
+            last = self.cells.pop()
+            if last != cell:
+                self.cells[slot] = last
+                self.slots[last] = slot
+            self.slots[cell] = -1
+
+    def pop_random(self, rng):
+        """Take out and return a cell, every one equally likely"""
+        cell = self.cells[rng.randrange(len(self.cells))]
+        self.discard(cell)
+        return cell
+
+class DistanceField:
+    """Shared BFS distances from the player over walkable cells.
+
+    Rebuilt only when the player moves or the terrain changes, and grown lazily:
+    the search stops as soon as the cell being asked about is reached, so one
+    search serves every wolf in a tick and only covers the area they are in.
+    """
+    def __init__(self, world, max_distance=CHASE_RADIUS):
+        self.world = world
+        self.max_distance = max_distance
+        self.dist = {}  # cell index -> steps, only for cells the current search reached
+        self.queue = []
+        self.head = 0
+        self.origin = None  # player x, y and terrain version the current search started from
+        self.builds = 0
+        width = world.width
+        self.offsets = [dy * width + dx for dx, dy in DIRECTIONS]
+
+    def refresh(self):
+        world = self.world
+        origin = self.origin
+        x, y = world.player_pos
+        # Compared field by field: this runs for every probe, so it mustn't build a key tuple
+        if origin is not None and origin[0] == x and origin[1] == y and origin[2] == world.terrain_version:
+            return
+        self.origin = (x, y, world.terrain_version)
+        self.dist.clear()
+        start = world.player_pos[1] * world.width + world.player_pos[0]
+        self.dist[start] = 0
+        self.queue = [start]
+        self.head = 0
+        self.builds += 1
+
+    def distance(self, x, y, limit=None):
+        """Steps from the player to (x, y), or -1 if unreachable within the limit"""
+        self.refresh()
+        world = self.world
+        limit = self.max_distance if limit is None else min(limit, self.max_distance)
+        if not (0 <= x < world.width and 0 <= y < world.height):
+            return -1
+        # BFS distance is never shorter than the straight-line king's-move distance
+        if max(abs(x - world.player_pos[0]), abs(y - world.player_pos[1])) > limit:
+            return -1
+
+        index = y * world.width + x
+        dist = self.dist
+        queue = self.queue
+        offsets = self.offsets
+        width = world.width
+        while index not in dist and self.head < len(queue):
+            cell = queue[self.head]
+            step = dist[cell]
+            if step >= limit:
+                break
+            self.head += 1
+            targets = world.get_move_targets(cell % width, cell // width)
+            for i, offset in enumerate(offsets):
+                if targets >> i & 1:
+                    neighbor = cell + offset
+                    if neighbor not in dist:
+                        dist[neighbor] = step + 1
+                        queue.append(neighbor)
+
+        found = dist.get(index, -1)
+        return found if found <= limit else -1
+
+class TickClock:
+    """Clock that moves forward a fixed amount per World.step instead of following the wall"""
+    def __init__(self, seconds_per_tick=0.2):
+        self.seconds_per_tick = seconds_per_tick
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self):
+        self.now += self.seconds_per_tick
+
+def percentiles(values):
+    """p50/p95/p99/max of a list of numbers (nearest rank), or None if it's empty"""
+    if not values:
+        return None
+    values = sorted(values)
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+    return {'p50': pick(0.5), 'p95': pick(0.95), 'p99': pick(0.99), 'max': values[-1],
+            'mean': sum(values) / len(values)}
+
+class Profiler:
+    """Per-phase timers, tick-time percentiles and per-tick probe/random-draw counts.
+
+    Nothing is measured until attach() swaps timed and counting wrappers in for a
+    world's methods (as instance attributes), so an unprofiled game runs the plain
+    methods untouched. Phase times are inclusive: draw contains compose_map.
+    """
+    PHASES = ('update_animals', 'update_hunger', 'move_player', 'eat_nearby_animal', 'huff_and_puff',
+              'compose_map', 'draw')
+    PROBES = ('is_position_free', 'is_walkable')
+
+    def __init__(self, capture_dir='.'):
+        self.capture_dir = capture_dir
+        self.phases = {}  # name -> [calls, total seconds, worst seconds]
+        self.tick_times = array('d')
+        self.counts = {'probes': 0, 'draws': 0}
+        self.per_tick = {name: array('L') for name in self.counts}
+        self.captures = []
+        self.capture = None  # (cProfile.Profile, tracemalloc snapshot, ticks left, first tick) while one runs
+
+    def record(self, name, elapsed):
+        stats = self.phases.setdefault(name, [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += elapsed
+        if elapsed > stats[2]:
+            stats[2] = elapsed
+
+    def timed(self, name, method):
+        stats = self.phases.setdefault(name, [0, 0.0, 0.0])
+        perf_counter = time.perf_counter
+
+        def timed_method(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = perf_counter() - start
+                stats[0] += 1
+                stats[1] += elapsed
+                if elapsed > stats[2]:
+                    stats[2] = elapsed
+        return timed_method
+
+    def counted(self, name, method):
+        counts = self.counts
+
+        def counted_method(*args, **kwargs):
+            counts[name] += 1
+            return method(*args, **kwargs)
+        return counted_method
+
+    def attach(self, world):
+        """Instrument one world; call it again for every new level"""
+        for name in self.PHASES:
+            setattr(world, name, self.timed(name, getattr(world, name)))
+        for name in self.PROBES:
+            setattr(world, name, self.counted('probes', getattr(world, name)))
+        # random() and getrandbits() are the draws every other Random method is built on
+        world.rng.random = self.counted('draws', world.rng.random)
+        world.rng.getrandbits = self.counted('draws', world.rng.getrandbits)
+
+        step = world.step
+        perf_counter = time.perf_counter
+
+        def timed_step(action=None):
+            start = perf_counter()
+            result = step(action)
+            self.end_tick(perf_counter() - start)
+            return result
+        world.step = timed_step
+
+    def end_tick(self, elapsed):
+        self.tick_times.append(elapsed)
+        for name, calls in self.counts.items():
+            self.per_tick[name].append(calls)
+            self.counts[name] = 0
+        if self.capture is not None:
+            profile, before, left, first = self.capture
+            self.capture = profile, before, left - 1, first
+            if left <= 1:
+                self.stop_capture()
+
+    def start_capture(self, ticks):
+        """cProfile and tracemalloc over the next `ticks` ticks; ignored while one is running"""
+        if self.capture is not None:
+            return
+        tracemalloc.start()
+        profile = cProfile.Profile()
+        self.capture = profile, tracemalloc.take_snapshot(), ticks, len(self.tick_times)
+        profile.enable()
+
+    def stop_capture(self):
+        profile, before, _, first = self.capture
+        profile.disable()
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        self.capture = None
+
+        path = os.path.join(self.capture_dir, f"capture-{len(self.captures) + 1}.prof")
+        profile.dump_stats(path)
+        functions = sorted(pstats.Stats(profile).stats.items(), key=lambda item: -item[1][2])[:15]
+        self.captures.append({
+            'first_tick': first,
+            'ticks': len(self.tick_times) - first,
+            'cprofile': path,
+            'top_functions': [{'function': f"{file}:{line}({name})", 'calls': calls,
+                               'self_ms': own * 1000, 'cumulative_ms': cumulative * 1000}
+                              for (file, line, name), (_, calls, own, cumulative, _) in functions],
+            'top_allocations': [{'where': str(stat.traceback[0]), 'kib': stat.size_diff / 1024,
+                                 'blocks': stat.count_diff}
+                                for stat in after.compare_to(before, 'lineno')[:10]],
+        })
+
+    def summary(self):
+        if self.capture is not None:
+            self.stop_capture()  # a window still open at exit gets cut short
+        tick_ms = percentiles([elapsed * 1000 for elapsed in self.tick_times])
+        return {
+            'ticks': len(self.tick_times),
+            'tick_ms': tick_ms,
+            'phases': {name: {'calls': calls, 'total_ms': total * 1000,
+                              'mean_us': total * 1e6 / calls if calls else 0, 'max_ms': worst * 1000}
+                       for name, (calls, total, worst) in sorted(self.phases.items())},
+            'per_tick': {name: percentiles(counts) for name, counts in self.per_tick.items()},
+            'captures': self.captures,
+        }
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=1)
+
+class EntityView(Entity):
+    """Entity-shaped window onto one slot of an EntityStore"""
+    __slots__ = ('store', 'index')
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    @property
+    def x(self):
+        return int(self.store.x[self.index])
+
+    @x.setter
+    def x(self, value):
+        self.store.x[self.index] = value
+
+    @property
+    def y(self):
+        return int(self.store.y[self.index])
+
+    @y.setter
+    def y(self, value):
+        self.store.y[self.index] = value
+
+    @property
+    def species(self):
+        return int(self.store.species[self.index])
+
+    @property
+    def speed(self):
+        return int(self.store.speed[self.index])
+
+    @speed.setter
+    def speed(self, value):
+        self.store.speed[self.index] = value
+
+    @property
+    def move_counter(self):
+        return int(self.store.move_counter[self.index])
+
+    @move_counter.setter
+    def move_counter(self, value):
+        self.store.move_counter[self.index] = value
+
+class EntityStore:
+    """Structure-of-arrays animal storage for stress levels with tens of thousands of animals.
+
+    Keeps x, y, species, speed and move_counter in NumPy arrays and a grid of slot
+    numbers (-1 for empty), and offers the same methods as OccupancyGrid so the rest
+    of World doesn't care which one it has. Prey are moved in vectorized passes by
+    update_prey; everything else sees EntityView objects.
+    """
+    _permutations = None  # all 40320 orders of the 8 directions, built on first use
+
+    def __init__(self, world, capacity=64):
+        if np is None:
+            raise ImportError("The array entity store needs NumPy: pip install numpy")
+        self.width = world.width
+        self.height = world.height
+        # Shares memory with world.walkable, so set_tile edits show up here too
+        self.walkable = np.frombuffer(world.walkable, dtype=np.uint8)
+        self.np_rng = np.random.default_rng(world.rng.getrandbits(64))
+        self.capacity = capacity
+        self.clear()
+
+    def clear(self):
+        self.x = np.zeros(self.capacity, dtype=np.int32)
+        self.y = np.zeros(self.capacity, dtype=np.int32)
+        self.species = np.zeros(self.capacity, dtype=np.int16)
+        self.speed = np.ones(self.capacity, dtype=np.int16)
+        self.move_counter = np.zeros(self.capacity, dtype=np.int16)
+        self.alive = np.zeros(self.capacity, dtype=bool)
+        self.wandering = np.zeros(self.capacity, dtype=bool)  # alive and moved by update_prey
+        self.views = [None] * self.capacity
+        self.grid = np.full(self.width * self.height, -1, dtype=np.int32)
+        self.count = 0  # slots in use, including dead ones waiting in free_slots
+        self.free_slots = []
+
+    def _grow(self):
+        self.capacity *= 2
+        for name in ('x', 'y', 'species', 'speed', 'move_counter', 'alive', 'wandering'):
+            old = getattr(self, name)
+            new = np.zeros(self.capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+        self.views.extend([None] * (self.capacity - len(self.views)))
+
+    @classmethod
+    def direction_orders(cls):
+        """(40320, 8) table of every order of the DIRECTIONS indexes"""
+        if cls._permutations is None:
+            EntityStore._permutations = np.array(list(permutations(range(len(DIRECTIONS)))), dtype=np.int8)
+        return EntityStore._permutations
+
+    def add(self, entity):
+        """Copy an Entity into the arrays and return the view that now stands for it"""
+        if self.free_slots:
+            index = self.free_slots.pop()
+        else:
+            if self.count == self.capacity:
+                self._grow()
+            index = self.count
+            self.count += 1
+        self.x[index] = entity.x
+        self.y[index] = entity.y
+        self.species[index] = entity.species
+        self.speed[index] = entity.speed
+        self.move_counter[index] = entity.move_counter
+        self.alive[index] = True
+        self.wandering[index] = SPECIES[entity.species].behavior == 'wander'
+        # Fresh view per slot use, so a stale reference can't see the next occupant
+        view = EntityView(self, index)
+        self.views[index] = view
+        self.grid[entity.y * self.width + entity.x] = index
+        return view
+
+    def remove(self, entity):
+        index = entity.index
+        cell = self.y[index] * self.width + self.x[index]
+        if self.grid[cell] == index:
+            self.grid[cell] = -1
+        self.alive[index] = False
+        self.wandering[index] = False
+        self.views[index] = None
+        self.free_slots.append(index)
+
+    def move(self, entity, x, y):
+        index = entity.index
+        cell = self.y[index] * self.width + self.x[index]
+        if self.grid[cell] == index:
+            self.grid[cell] = -1
+        self.x[index] = x
+        self.y[index] = y
+        self.grid[y * self.width + x] = index
+
+    def at(self, x, y):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            index = self.grid[y * self.width + x]
+            if index >= 0:
+                return self.views[index]
+        return None
+
+    def of_kind(self, species):
+        live = self.alive[:self.count] & (self.species[:self.count] == species)
+        return [self.views[index] for index in np.flatnonzero(live)]
+
+    roster = of_kind
+
+    def near(self, x, y, radius, species=None):
+        """Yield entities within `radius` squares of (x, y), optionally only one species id"""
+        left = max(0, x - radius)
+        right = min(self.width - 1, x + radius)
+        top = max(0, y - radius)
+        bottom = min(self.height - 1, y + radius)
+        if left > right or top > bottom:
+            return
+        window = self.grid.reshape(self.height, self.width)[top:bottom + 1, left:right + 1]
+        found = window[window >= 0]
+        if species is not None:
+            found = found[self.species[found] == species]
+        for index in found:
+            yield self.views[index]
+
+    def within(self, left, top, right, bottom):
+        window = self.grid.reshape(self.height, self.width)[top:bottom, left:right]
+        for index in window[window >= 0].tolist():
+            yield self.views[index]
+
+    def update_prey(self, world, move_chance=0.3):
+        """Move every wandering animal for one tick in vectorized passes.
+
+        Same rules as Entity.move_random, with one deterministic conflict rule: a
+        cell can only be entered if it was empty when the tick started, and when
+        several animals want the same cell in the same pass, the lowest slot wins
+        and the others go on to their next direction.
+        """
+        count = self.count
+
+        # 30% roll, then speed gating, exactly like move_random's counter
+        movers = np.flatnonzero(self.wandering[:count] & (self.np_rng.random(count) < move_chance))
+        self.move_counter[movers] += 1
+        movers = movers[self.move_counter[movers] >= self.speed[movers]]
+        self.move_counter[movers] = 0
+        if not movers.size:
+            return
+
+        orders = self.direction_orders()
+        steps = np.array(DIRECTIONS, dtype=np.int32)
+        order = orders[self.np_rng.integers(0, len(orders), movers.size)]
+        step_x = steps[order, 0]
+        step_y = steps[order, 1]
+
+        width = self.width
+        grid = self.grid
+        old_x = self.x[movers]
+        old_y = self.y[movers]
+        targets = np.full(movers.size, -1, dtype=np.int64)
+        player_cell = world.player_pos[1] * width + world.player_pos[0]
+
+        for attempt in range(len(DIRECTIONS)):
+            pending = np.flatnonzero(targets < 0)
+            if not pending.size:
+                break
+            new_x = old_x[pending] + step_x[pending, attempt]
+            new_y = old_y[pending] + step_y[pending, attempt]
+            inside = (new_x >= 0) & (new_x < width) & (new_y >= 0) & (new_y < self.height)
+            pending = pending[inside]
+            cells = new_y[inside] * width + new_x[inside]
+            legal = (self.walkable[cells] == 1) & (grid[cells] < 0) & (cells != player_cell)
+            pending = pending[legal]
+            cells = cells[legal]
+            # pending is in slot order, so the first occurrence of a cell is the lowest slot
+            cells, first = np.unique(cells, return_index=True)
+            pending = pending[first]
+            grid[cells] = movers[pending]
+            targets[pending] = cells
+
+        moved = targets >= 0
+        vacated = old_y[moved] * width + old_x[moved]
+        grid[vacated] = -1
+        self.x[movers[moved]] = targets[moved] % width
+        self.y[movers[moved]] = targets[moved] // width
+
+        free = world.free_cells
+        if free is not None:
+            for cell in vacated[self.walkable[vacated] == 1].tolist():
+                free.add(cell)
+            for cell in targets[moved].tolist():
+                free.discard(cell)
+
+class CellWidths(dict):
+    """Cache of how many terminal columns a cell's text takes up"""
+    def __missing__(self, cell):
+        width = 0
+        last = 0
+        for ch in cell:
+            if ch == '\ufe0f':
+                # Emoji presentation selector widens a narrow symbol like ⚠ or 🐿
+                width += 2 - last if last == 1 else 0
+                last = 2
+            elif unicodedata.combining(ch) or unicodedata.category(ch) == 'Cf':
+                continue
+            else:
+                last = 2 if unicodedata.east_asian_width(ch) in 'WF' else 1
+                width += last
+        self[cell] = width
+        return width
+
+class TerminalRenderer:
+    """Redraws only what changed since the last frame, using ANSI cursor moves.
+
+    A frame is a list of lines and each line is a list of cells (strings). Map rows
+    have one cell per tile; HUD lines are usually a single cell holding the text.
+    Everything for a frame goes out in one write. The renderer copies what it shows
+    into lists of its own, so callers can keep refilling the same ones.
+    """
+    def __init__(self, out=None):
+        self.out = out if out is not None else sys.stdout
+        self.previous = None  # copy of the last frame shown, None forces a full redraw
+        self.widths = CellWidths()
+        self.frames = 0
+        self.bytes_written = 0
+        self.render_time = 0.0
+
+    def reset(self):
+        """Forget what's on screen, e.g. after something else printed over it"""
+        self.previous = None
+
+    def columns(self, cells):
+        return sum(map(self.widths.__getitem__, cells))
+
+    def size(self):
+        """os.terminal_size of the terminal being drawn on, None when it isn't one"""
+        try:
+            return os.get_terminal_size(self.out.fileno())
+        except (AttributeError, ValueError, OSError):
+            return None
+
+    def render(self, lines):
+        start = time.perf_counter()
+        parts = []
+        previous = self.previous
+        if previous is None:
+            parts.append('\x1b[H\x1b[2J')
+            previous = []
+
+        widths = self.widths
+        for row, line in enumerate(lines):
+            old = previous[row] if row < len(previous) else None
+            if old == line:
+                continue
+            if old is None:
+                parts.append(f'\x1b[{row + 1};1H{"".join(line)}\x1b[K')
+                previous.append(line[:])
+                continue
+
+            changed = list(compress(count(), map(ne, old, line)))
+            same_layout = len(old) == len(line) and all(
+                widths[old[i]] == widths[line[i]] for i in changed)
+            if same_layout:
+                # Columns line up, so each changed cell can be overwritten in place
+                column = 0
+                done = 0
+                for i in changed:
+                    column += self.columns(line[done:i])
+                    done = i
+                    parts.append(f'\x1b[{row + 1};{column + 1}H{line[i]}')
+            else:
+                # A wide cell came or went: everything after it shifts, redo the rest of the line
+                first = changed[0] if changed else min(len(old), len(line))
+                column = self.columns(line[:first])
+                parts.append(f'\x1b[{row + 1};{column + 1}H{"".join(line[first:])}\x1b[K')
+            old[:] = line  # same length as last time for map rows, so nothing is allocated
+
+        # Park the cursor under the frame and wipe leftovers (shorter frame, stray prints)
+        parts.append(f'\x1b[{len(lines) + 1};1H\x1b[J')
+
+        output = ''.join(parts)
+        self.out.write(output)
+        self.out.flush()
+        del previous[len(lines):]
+        self.previous = previous
+        self.frames += 1
+        self.bytes_written += len(output.encode('utf-8'))
+        self.render_time += time.perf_counter() - start
+
+    def stats(self):
+        frames = max(self.frames, 1)
+        return {
+            'frames': self.frames,
+            'bytes_per_frame': self.bytes_written / frames,
+            'fps': self.frames / self.render_time if self.render_time else 0.0,
+        }
+
+# The terminal everything draws to unless told otherwise
+SCREEN = TerminalRenderer()
+
+def framed(rows, width):
+    """Turn map rows into renderer lines with the game's = and | border"""
+    border = ['=' * (width + 2)]
+    return [border] + [['|'] + row + ['|'] for row in rows] + [border]
+
+class Camera:
+    """The part of the map that is on screen: a window that follows the player.
+
+    Without a fixed size the window is fitted to the terminal (the whole map when
+    there is no terminal, or it fits). Terrain glyphs for the rows in view are kept
+    between frames and rebuilt only when the window scrolls, changes size or the
+    terrain is edited, so a frame costs the same on any size of map. Frames are
+    composed into one set of line lists that is refilled every time.
+    """
+    def __init__(self, width=None, height=None):
+        self.width = width
+        self.height = height
+        self.left = 0
+        self.top = 0
+        self.view_width = None  # set by fit()
+        self.view_height = None
+        self.key = None  # what `rows` were built for
+        self.rows = []
+        self.rebuilds = 0
+        self.frame = []  # the lines compose_map draws into
+        self.frame_size = None
+
+    def fit(self, world, size=None, reserved=0):
+        """Size the window for a terminal of `size` with `reserved` lines kept for the HUD.
+        Returns True if the window changed size"""
+        width = self.width or world.width
+        height = self.height or world.height
+        if size is not None:
+            # The border takes two columns and three lines (with the cursor's line under
+            # it), and each animal is two columns wide, so leave room for a few per row
+            width = min(width, size.columns - 8)
+            height = min(height, size.lines - reserved - 3)
+        width = max(1, min(width, world.width))
+        height = max(1, min(height, world.height))
+        changed = self.view_width is not None and (width, height) != (self.view_width, self.view_height)
+        self.view_width, self.view_height = width, height
+        return changed
+
+    def follow(self, x, y, world):
+        """Centre the window on (x, y), stopping at the edges of the map"""
+        if self.view_width is None:
+            self.fit(world)
+        self.left = min(max(0, x - self.view_width // 2), world.width - self.view_width)
+        self.top = min(max(0, y - self.view_height // 2), world.height - self.view_height)
+        return self.left, self.top
+
+    def terrain_rows(self, world):
+        """Terrain glyphs of each row in view as lists of cells, with the | border at both ends"""
+        key = (self.left, self.top, self.view_width, self.view_height, world.terrain_version)
+        if key != self.key:
+            right = self.left + self.view_width
+            self.rows = [['|', *world.terrain_row(y, self.left, right), '|']
+                         for y in range(self.top, self.top + self.view_height)]
+            self.key = key
+            self.rebuilds += 1
+        return self.rows
+
+    def frame_lines(self):
+        """The lines compose_map fills in: = border, one line per row in view, = border"""
+        size = (self.view_width, self.view_height)
+        if size != self.frame_size:
+            border = ['=' * (self.view_width + 2)]
+            self.frame = [border] + [[] for _ in range(self.view_height)] + [border]
+            self.frame_size = size
+        return self.frame
+
+def little_endian(values):
+    """Array in little-endian byte order (in place), the order save files use"""
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+def write_sections(path, sections):
+    """SAVE_MAGIC, version and a table of contents, then each (tag, data) section 8-byte aligned"""
+    header = len(SAVE_MAGIC) + 4 + 20 * len(sections)
+    offset = header
+    table = []
+    for tag, data in sections:
+        offset += -offset % 8
+        size = len(memoryview(data).cast('B'))
+        table.append(struct.pack('<4sQQ', tag, offset, size))
+        offset += size
+    # Written beside it and swapped in, so a world loaded from `path` (whose terrain
+    # may still be mapped from the old file) can be saved back over it
+    partial_path = f"{path}.partial"
+    with open(partial_path, 'wb') as f:
+        f.write(SAVE_MAGIC + struct.pack('<HH', SAVE_VERSION, len(sections)) + b''.join(table))
+        position = header
+        for tag, data in sections:
+            f.write(bytes(-position % 8))
+            position += -position % 8
+            f.write(data)
+            position += len(memoryview(data).cast('B'))
+    os.replace(partial_path, path)
+
+def read_sections(data):
+    """{tag: memoryview} of a save file's sections, from bytes or an mmap"""
+    view = memoryview(data)
+    if view[:len(SAVE_MAGIC)] != SAVE_MAGIC:
+        raise ValueError("not a saved world")
+    version, count = struct.unpack_from('<HH', view, len(SAVE_MAGIC))
+    if version > SAVE_VERSION:
+        raise ValueError(f"save format {version} is newer than this game understands ({SAVE_VERSION})")
+    sections = {}
+    for i in range(count):
+        tag, offset, size = struct.unpack_from('<4sQQ', view, len(SAVE_MAGIC) + 4 + 20 * i)
+        sections[tag] = view[offset:offset + size]
+    return sections
+
+CHARACTERS = [
+    ('Batman', '🦇', "The Dark Knight - Master of stealth"),
+    ('Robin', '🐦', "The Wonder"),
+    ('Spider-Man', '🕷️', "Your friendly neighborhood spider"),
+    ('Black Panther', '🐆', "Wakanda Forever!"),
+    ('Iron Man', '🤖', "Genius, billionaire, philanthropist"),
+    ('Captain America', '🛡️', "The First Avenger"),
+    ('Wonder Woman', '⚔️', "Amazon warrior princess"),
+    ('Superman', '💪', "The Man of Steel"),
+    ('Hulk', '💚', "The strongest there is!"),
+    ('Princess Peach', '👸', "Ruler of the Mushroom Kingdom")
+]
+
 def select_character():
-    characters = [
-        ('Batman', '🦇', "The Dark Knight - Master of stealth"),
-        ('Robin', '🐦', "The Wonder"),
-        ('Spider-Man', '🕷️', "Your friendly neighborhood spider"),
-        ('Black Panther', '🐆', "Wakanda Forever!"),
-        ('Iron Man', '🤖', "Genius, billionaire, philanthropist"),
-        ('Captain America', '🛡️', "The First Avenger"),
-        ('Wonder Woman', '⚔️', "Amazon warrior princess"),
-        ('Superman', '💪', "The Man of Steel"),
-        ('Hulk', '💚', "The strongest there is!"),
-        ('Princess Peach', '👸', "Ruler of the Mushroom Kingdom")
-    ]
+    characters = CHARACTERS
     
     os.system('cls' if os.name == 'nt' else 'clear')
     print("\n=== Choose Your Hero! ===\n")
@@ -65,87 +1095,336 @@ def select_character():
         except ValueError:
             print("Please enter a valid number")
 
+TERRAINS = ('classic', 'noise')
+
+def smoothstep(t):
+    return t * t * (3 - 2 * t)
+
+def value_noise(rng, length, period):
+    """Smooth 1D noise in [0, 1): random values every `period` cells, eased in between"""
+    lattice = rng.random(length // period + 2, dtype=np.float32)
+    position = np.arange(length, dtype=np.float32) / period
+    i = position.astype(np.int32)
+    t = smoothstep(position - i)
+    return lattice[i] * (1 - t) + lattice[i + 1] * t
+
+def value_noise_2d(rng, width, height, period):
+    """2D value noise, shape (height, width): eased along x first, then y"""
+    lattice = rng.random((height // period + 2, width // period + 2), dtype=np.float32)
+    x = np.arange(width, dtype=np.float32) / period
+    ix = x.astype(np.int32)
+    tx = smoothstep(x - ix)
+    rows = lattice[:, ix] * (1 - tx) + lattice[:, ix + 1] * tx
+    y = np.arange(height, dtype=np.float32) / period
+    iy = y.astype(np.int32)
+    ty = smoothstep(y - iy)[:, None]
+    # a + (b - a) * t, in place: these are the full-map arrays
+    noise = rows[iy]
+    upper = rows[iy + 1]
+    upper -= noise
+    upper *= ty
+    noise += upper
+    return noise
+
+def connected_air(tiles, x, y):
+    """Flat bool array of the AIR cells the player can walk to from (x, y), moving up, down, left and right.
+
+    Works on runs of AIR along each row rather than on cells: runs in neighboring
+    rows are joined where their columns overlap, and the runs joined to the one
+    holding (x, y) are painted back onto the map.
+    """
+    height, width = tiles.shape
+    edges = np.zeros((height, width + 2), dtype=np.int8)
+    edges[:, 1:-1] = tiles == AIR
+    edges = np.diff(edges, axis=1)  # 1 where a run starts, -1 just past where it ends
+    rows, starts = np.nonzero(edges == 1)
+    ends = np.nonzero(edges == -1)[1]  # row-major like starts, so they pair up
+    first = np.searchsorted(rows, np.arange(height + 1)).tolist()  # runs of row r: first[r]:first[r + 1]
+    starts_list = starts.tolist()
+    ends_list = ends.tolist()
+
+    seed = next((run for run in range(first[y], first[y + 1]) if starts_list[run] <= x < ends_list[run]), None)
+    if seed is None:
+        return np.zeros(height * width, dtype=bool)  # (x, y) isn't AIR
+    reached = np.zeros(len(starts_list), dtype=bool)
+    reached[seed] = True
+    pending = [(seed, y)]
+    while pending:
+        run, row = pending.pop()
+        start, end = starts_list[run], ends_list[run]
+        for other_row in (row - 1, row + 1):
+            if 0 <= other_row < height:
+                for other in range(first[other_row], first[other_row + 1]):
+                    if starts_list[other] >= end:
+                        break
+                    if ends_list[other] > start and not reached[other]:
+                        reached[other] = True
+                        pending.append((other, other_row))
+
+    # +1 where a reached run starts and -1 where it ends, summed along the row
+    paint = np.zeros((height, width + 1), dtype=np.int8)
+    paint[rows[reached], starts[reached]] = 1
+    paint[rows[reached], ends[reached]] = -1
+    return (np.cumsum(paint, axis=1)[:, :width] > 0).ravel()
+
 class World:
-    def __init__(self, width=40, height=20, level=1):
+    free_cells = None  # FreeCells that spawn_animals draws from, built the first time it runs
+    movers = None  # each species' move function, by id, built on the first tick
+
+    def __init__(self, width=40, height=20, level=1, hero=None, seed=None, clock=time.time,
+                 entity_store=False, pathfinding=True, prey_flee=False, balance=None, terrain='classic'):
+        if terrain not in TERRAINS:
+            raise ValueError(f"Unknown terrain {terrain!r}, expected one of {', '.join(TERRAINS)}")
         self.width = width
         self.height = height
         self.level = level
-        self.hero_name, self.hero_symbol = select_character()
-        self.blocks = {
-            'air': ' ',
-            'grass': '▒',
-            'tree': '♣',
-            'stone': '▓',
-            'player': self.hero_symbol,  # Use selected character
-            'rabbit': '🐰',
-            'squirrel': '🐿️',
-            'wolf': '🐺'
-        }
+        # Pass hero=(name, symbol) to skip the interactive prompt
+        self.hero_name, self.hero_symbol = hero if hero is not None else select_character()
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.clock = clock
+        self.ticks = 0
+        self.balance = dict(DEFAULT_BALANCE, **(balance or {}))
+        # 'classic' is a flat strip of ground; 'noise' has hills, caves and forests (needs NumPy)
+        self.terrain = terrain
+        self.camera = self.new_camera()
+        self.blocks = self.make_blocks()
         self.world_map = self.generate_world()
+        self.build_walkability()
+        # entity_store=True keeps animals in NumPy arrays for very crowded levels
+        self.entity_store = self.new_entity_store() if entity_store else None
+        self.occupancy = self.entity_store or self.new_occupancy()
         # Find the ground level at the middle of the map
         middle_x = width // 2
         for y in range(height):
-            if self.world_map[y][middle_x] == self.blocks['grass']:
+            if self.tile_at(middle_x, y) == GRASS:
                 self.player_pos = [middle_x, y - 1]
                 break
+        # Wolves follow the distance field; prey_flee makes prey run from the player too
+        self.pathfinding = pathfinding
+        self.prey_flee = prey_flee
+        self.distance_field = DistanceField(self)
+        self.make_scratch()
         self.player_hunger = 100
-        self.animals = []
+        self.clear_animals()
         self.spawn_initial_animals()
-        self.last_move_time = time.time()
+        self.last_move_time = self.clock()
         self.game_won = False
         self.game_over = False
         self.game_over_message = ""
         self.can_huff = True  # Add cooldown for huff ability
 
+    def make_blocks(self):
+        return {
+            'air': TILE_GLYPHS[AIR],
+            'grass': TILE_GLYPHS[GRASS],
+            'tree': TILE_GLYPHS[TREE],
+            'stone': TILE_GLYPHS[STONE],
+            'player': self.hero_symbol,  # Use selected character
+            'rabbit': RABBIT.glyph,
+            'squirrel': SQUIRREL.glyph,
+            'wolf': WOLF.glyph
+        }
+
+    def new_occupancy(self):
+        return OccupancyGrid(self.width, self.height)
+
+    def new_camera(self):
+        return Camera()
+
+    def new_entity_store(self):
+        return EntityStore(self)
+
+    def make_scratch(self):
+        # Lists a tick reuses instead of building new ones, so a steady tick allocates nothing
+        self.direction_order = list(DIRECTION_INDEXES)  # Entity.move_random's shuffle
+        self.chase_steps = [0] * len(DIRECTIONS)  # chase_step's candidate directions
+
     def generate_world(self):
-        # Initialize empty world
-        world = [[self.blocks['air'] for _ in range(self.width)] for _ in range(self.height)]
+        if self.terrain == 'noise':
+            return self.generate_noise_world()
+
+        # Initialize empty world: one tile ID per cell, row after row
+        width = self.width
+        world = bytearray(width * self.height)
         
         # Generate terrain
         ground_height = self.height - 3
-        for x in range(self.width):
+        for x in range(width):
             # Add some variation to ground height
-            variation = random.randint(-1, 1)
+            variation = self.rng.randint(-1, 1)
             current_height = ground_height + variation
             
-            # Place ground blocks
-            for y in range(current_height, self.height):
-                world[y][x] = self.blocks['grass']
+            # Place ground blocks, the whole column below the surface in one slice
+            top = max(current_height, 0)
+            world[top * width + x::width] = bytes([GRASS]) * (self.height - top)
             
             # Randomly place trees
-            if random.random() < 0.1 and current_height > 0:  # 10% chance
-                world[current_height - 1][x] = self.blocks['tree']
+            if self.rng.random() < 0.1 and current_height > 0:  # 10% chance
+                world[(current_height - 1) * width + x] = TREE
             
             # Randomly place stone
-            if random.random() < 0.2:  # 20% chance
-                world[current_height][x] = self.blocks['stone']
+            if self.rng.random() < 0.2:  # 20% chance
+                world[current_height * width + x] = STONE
 
         return world
 
-    def is_near_wall(self, x, y):
-        # Check if position is adjacent to any non-air blocks
-        for dx in [-1, 0, 1]:
-            for dy in [-1, 0, 1]:
-                check_x = x + dx
-                check_y = y + dy
-                if (0 <= check_x < self.width and 
-                    0 <= check_y < self.height and 
-                    self.world_map[check_y][check_x] in [self.blocks['grass'], self.blocks['stone']]):
+    def generate_noise_world(self):
+        """Rolling hills with caves under them and trees in clumps, built in whole-array steps.
+
+        All the randomness comes from one draw on the world RNG, so a seed always
+        gives the same tiles.
+        """
+        if np is None:
+            raise ImportError("Noise terrain needs NumPy: pip install numpy")
+        width, height = self.width, self.height
+        rng = np.random.default_rng(self.rng.getrandbits(64))
+
+        # Surface: three octaves of hills, from about a third of the way down to the classic ground line
+        hills = (value_noise(rng, width, 48) * 4 + value_noise(rng, width, 16) * 2 +
+                 value_noise(rng, width, 6)) / 7
+        low, high = height * 0.35, height - 3
+        surface = (low + (high - low) * hills).astype(np.int32)
+
+        rows = np.arange(height, dtype=np.int32)[:, None]
+        depth = rows - surface  # below ground when >= 0
+        tiles = np.where(depth >= 0, np.uint8(GRASS), np.uint8(AIR))
+        # Soil a few cells deep over bedrock
+        soil = 2 + (value_noise(rng, width, 12) * 4).astype(np.int32)
+        tiles[depth >= soil] = STONE
+        # Caves: where two octaves of 2D noise peak, leaving the top soil and the bottom row whole
+        caves = value_noise_2d(rng, width, height, 16) * 2 + value_noise_2d(rng, width, height, 7)
+        tiles[(caves > 2.05) & (depth >= 3) & (rows < height - 1)] = AIR
+
+        # Forests where a slow density wave is high, rocks dotted about the surface;
+        # the middle column is left alone, that's where the hero comes down
+        features = np.arange(width) != width // 2
+        forest = value_noise(rng, width, 32)
+        trees = features & (surface > 0) & (rng.random(width) < np.clip((forest - 0.45) * 2, 0, 0.7))
+        tiles[surface[trees] - 1, np.flatnonzero(trees)] = TREE
+        rocks = features & ~trees & (rng.random(width) < 0.08)
+        tiles[surface[rocks], np.flatnonzero(rocks)] = STONE
+        return bytearray(tiles.tobytes())
+
+    def tile_at(self, x, y):
+        return self.world_map[y * self.width + x]
+
+    def build_walkability(self):
+        """Precompute which cells are next to walls and which ones animals may stand on"""
+        width = self.width
+        if np is not None:
+            self.near_wall, self.walkable, self.move_targets = self._walkability_arrays()
+        else:
+            self._scan_walkability()
+            # Neighbor tables are filled in lazily the first time a cell is visited
+            self.move_targets = array('H', [UNKNOWN_TARGETS]) * (width * self.height)
+        self.terrain_version = getattr(self, 'terrain_version', -1) + 1
+        self.free_cells = None
+
+    def _walkability_arrays(self):
+        # The same tables as _scan_walkability, by spreading the solid cells one step each way
+        tiles = np.frombuffer(self.world_map, dtype=np.uint8).reshape(self.height, self.width)
+        solid = (tiles == GRASS) | (tiles == STONE)
+        grown = solid.copy()
+        grown[1:] |= solid[:-1]
+        grown[:-1] |= solid[1:]
+        near = grown.copy()
+        near[:, 1:] |= grown[:, :-1]
+        near[:, :-1] |= grown[:, 1:]
+        walkable = (tiles == AIR) & ~near
+        # And every neighbor table at once, rather than each cell on first visit
+        targets = np.zeros(tiles.shape, dtype=np.uint16)
+        height, width = tiles.shape
+        for i, (dx, dy) in enumerate(DIRECTIONS):
+            rows = slice(max(0, -dy), height - max(0, dy))
+            columns = slice(max(0, -dx), width - max(0, dx))
+            neighbors = walkable[max(0, dy):height + min(0, dy), max(0, dx):width + min(0, dx)]
+            targets[rows, columns] |= neighbors.astype(np.uint16) << i
+        move_targets = array('H')
+        move_targets.frombytes(targets.tobytes())
+        return (bytearray(near.astype(np.uint8).tobytes()), bytearray(walkable.astype(np.uint8).tobytes()),
+                move_targets)
+
+    def _scan_walkability(self):
+        width = self.width
+        self.near_wall = bytearray(width * self.height)
+        self.walkable = bytearray(b'\x01') * (width * self.height)
+
+        for y in range(self.height):
+            row = bytes(self.world_map[y * width:(y + 1) * width])  # world_map may be a memoryview
+            # Most rows are open sky, skip them without looking at each cell
+            if row.count(AIR) == width:
+                continue
+            for x, tile in enumerate(row):
+                if tile == AIR:
+                    continue
+                self.walkable[y * width + x] = 0
+                if tile == GRASS or tile == STONE:
+                    for check_y in range(max(0, y - 1), min(self.height, y + 2)):
+                        for check_x in range(max(0, x - 1), min(width, x + 2)):
+                            self.near_wall[check_y * width + check_x] = 1
+                            self.walkable[check_y * width + check_x] = 0
+
+    def _scan_near_wall(self, x, y):
+        # Check if position is adjacent to any grass or stone blocks
+        for check_y in range(max(0, y - 1), min(self.height, y + 2)):
+            for check_x in range(max(0, x - 1), min(self.width, x + 2)):
+                if self.tile_at(check_x, check_y) in SOLID:
                     return True
         return False
 
+    def set_tile(self, x, y, tile):
+        """Change one terrain tile (a tile ID like STONE) and patch the walkability data around it"""
+        self.world_map[y * self.width + x] = tile
+        width = self.width
+        for check_y in range(max(0, y - 1), min(self.height, y + 2)):
+            for check_x in range(max(0, x - 1), min(width, x + 2)):
+                index = check_y * width + check_x
+                self.near_wall[index] = self._scan_near_wall(check_x, check_y)
+                self.walkable[index] = self.world_map[index] == AIR and not self.near_wall[index]
+        # Any cell that could step onto a changed cell needs its table redone
+        for check_y in range(max(0, y - 2), min(self.height, y + 3)):
+            for check_x in range(max(0, x - 2), min(width, x + 3)):
+                self.move_targets[check_y * width + check_x] = UNKNOWN_TARGETS
+        for check_y in range(max(0, y - 1), min(self.height, y + 2)):
+            for check_x in range(max(0, x - 1), min(width, x + 2)):
+                self.recheck_free_cell(check_x, check_y)
+        self.terrain_version += 1
+
+    def get_move_targets(self, x, y):
+        """Bitmask of DIRECTIONS that lead from (x, y) onto a walkable cell"""
+        index = y * self.width + x
+        targets = self.move_targets[index]
+        if targets == UNKNOWN_TARGETS:
+            targets = 0
+            for i, (dx, dy) in enumerate(DIRECTIONS):
+                if self.is_walkable(x + dx, y + dy):
+                    targets |= 1 << i
+            self.move_targets[index] = targets
+        return targets
+
+    def is_walkable(self, x, y):
+        """Air that isn't next to a wall - where animals are allowed to stand"""
+        return 0 <= x < self.width and 0 <= y < self.height and self.walkable[y * self.width + x] == 1
+
+    def is_near_wall(self, x, y):
+        # Check if position is adjacent to any grass or stone blocks
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.near_wall[y * self.width + x] == 1
+        return self._scan_near_wall(x, y)
+
     def is_position_free(self, x, y, ignore_entity=None):
         """Check if a position is free of walls and other animals"""
         # Check bounds and walls
         if (x < 0 or x >= self.width or 
             y < 0 or y >= self.height or 
-            self.world_map[y][x] != self.blocks['air']):
+            self.world_map[y * self.width + x] != AIR):
             return False
             
         # Check for other animals
-        for animal in self.animals:
-            if animal != ignore_entity and animal.x == x and animal.y == y:
-                return False
+        occupant = self.occupancy.at(x, y)
+        if occupant is not None and occupant is not ignore_entity:
+            return False
                 
         # Check for player
         if x == self.player_pos[0] and y == self.player_pos[1]:
@@ -153,77 +1432,197 @@ class World:
             
         return True
 
-    def spawn_initial_animals(self):
+    def move_entity(self, entity, x, y):
+        """Move an entity and keep the occupancy grid and free cells in sync"""
+        free = self.free_cells
+        if free is not None:
+            index = entity.y * self.width + entity.x
+            if self.walkable[index] == 1:
+                free.add(index)
+            free.discard(y * self.width + x)
+        self.occupancy.move(entity, x, y)
+
+    def add_entity(self, entity):
+        if self.entity_store is not None:
+            entity = self.entity_store.add(entity)
+        else:
+            self.occupancy.add(entity)
+        self.animals.append(entity)
+        self.species_counts[entity.species] += 1
+        if self.free_cells is not None:
+            self.free_cells.discard(entity.y * self.width + entity.x)
+        return entity
+
+    def remove_entity(self, entity):
+        self.animals.remove(entity)
+        self.occupancy.remove(entity)
+        self.species_counts[entity.species] -= 1
+        if self.free_cells is not None:
+            self.recheck_free_cell(entity.x, entity.y)
+
+    def clear_animals(self):
+        if self.free_cells is not None:
+            for animal in self.animals:
+                if self.walkable[animal.y * self.width + animal.x] == 1:
+                    self.free_cells.add(animal.y * self.width + animal.x)
         self.animals = []
-        self.spawn_animals(6, 'rabbit', speed=5)
-        self.spawn_animals(4, 'squirrel', speed=1)
+        self.occupancy.clear()
+        # Live animals per species id, kept up to date by add_entity and remove_entity
+        self.species_counts = [0] * len(SPECIES)
+
+    def recheck_free_cell(self, x, y):
+        """Put (x, y) in or take it out of free_cells after something there changed"""
+        if self.free_cells is None:
+            return
+        index = y * self.width + x
+        if (self.walkable[index] == 1 and self.occupancy.at(x, y) is None and
+                (x != self.player_pos[0] or y != self.player_pos[1])):
+            self.free_cells.add(index)
+        else:
+            self.free_cells.discard(index)
+
+    def spawn_cells(self):
+        """FreeCells of every walkable cell with nothing on it, for spawn_animals to draw from.
+
+        On noise terrain that's only cells the player can get to, so no level
+        puts its prey in a sealed cave.
+
+        Built from the walkability table on first use; after that add_entity,
+        remove_entity, move_entity, move_player and set_tile keep it current.
+        """
+        if self.free_cells is None:
+            flags = self.walkable
+            if self.terrain == 'noise':
+                # Caves can be sealed off from the surface: only spawn where the player can get to
+                tiles = np.frombuffer(self.world_map, dtype=np.uint8).reshape(self.height, self.width)
+                reachable = connected_air(tiles, *self.player_pos)
+                flags = np.frombuffer(flags, dtype=np.uint8) & reachable
+            free = FreeCells.of_flags(flags)
+            for animal in self.animals:
+                free.discard(animal.y * self.width + animal.x)
+            free.discard(self.player_pos[1] * self.width + self.player_pos[0])
+            self.free_cells = free
+        return self.free_cells
+
+    def count_of(self, name):
+        return self.species_counts[SPECIES_BY_NAME[name].id]
+
+    def prey_remaining(self):
+        counts = self.species_counts
+        remaining = 0
+        for species in SPECIES:  # a plain loop: this runs every tick and a generator would be garbage
+            if species.prey:
+                remaining += counts[species.id]
+        return remaining
+
+    def spawn_initial_animals(self):
+        self.clear_animals()
+        self.spawn_animals(6, 'rabbit')
+        self.spawn_animals(4, 'squirrel')
         # Spawn wolves based on level
-        self.spawn_animals(self.level, 'wolf', speed=1)
+        self.spawn_animals(self.level, 'wolf')
 
-    def spawn_animals(self, count, animal_type, speed):
-        spawned = 0
-        attempts = 0
-        max_attempts = 100 * count  # Increase max attempts to find valid positions
-        
-        while spawned < count and attempts < max_attempts:
-            x = random.randint(0, self.width - 1)
-            y = random.randint(0, self.height - 1)
-            
-            if self.is_position_free(x, y) and not self.is_near_wall(x, y):
-                self.animals.append(Entity(x, y, self.blocks[animal_type], speed))
-                spawned += 1
-            
-            attempts += 1
+    def spawn_animals(self, count, animal_type, speed=None):
+        """Put `count` animals on distinct free cells, each one picked uniformly at random.
+
+        Raises ValueError, before placing any, if there aren't that many free cells.
+        """
+        free = self.spawn_cells()
+        if count > len(free):
+            raise ValueError(f"No room for {count} {animal_type}: only {len(free)} free cells left")
+        for _ in range(count):
+            y, x = divmod(free.pop_random(self.rng), self.width)
+            self.add_entity(Entity(x, y, animal_type, speed))
 
     def update_animals(self):
-        # Move animals randomly
+        if self.entity_store is not None:
+            # All prey at once, then hunters one by one as usual
+            self.entity_store.update_prey(self, self.balance['move_chance'])
+            for species in SPECIES:
+                if species.behavior == 'hunt':
+                    for wolf in self.entity_store.of_kind(species.id):
+                        if self.rng.random() < self.balance['move_chance']:
+                            self.move_wolf(wolf)
+            if len(self.animals) == 0:
+                self.game_won = True
+            return
+
+        # Each species' behavior picks how its animals move: hunters chase the player
+        moves = self.movers
+        if moves is None or len(moves) != len(SPECIES):
+            behaviors = {'wander': lambda animal: animal.move_random(self), 'hunt': self.move_wolf}
+            moves = self.movers = [behaviors[species.behavior] for species in SPECIES]
+        move_chance = self.balance['move_chance']
+        random = self.rng.random
         for animal in self.animals:
-            if random.random() < 0.3:  # 30% chance to move
-                if animal.symbol == self.blocks['wolf']:
-                    self.move_wolf(animal)  # Wolves hunt the player
-                else:
-                    animal.move_random(self)
+            if random() < move_chance:  # 30% chance to move
+                moves[animal.species](animal)
         
         # Check for win condition
         if len(self.animals) == 0:
             self.game_won = True
 
+    def chase_step(self, wolf):
+        """Next cell down the distance field towards the player, None if the field can't help"""
+        field = self.distance_field
+        here = field.distance(wolf.x, wolf.y)
+        if here <= 0:
+            return None
+        targets = self.get_move_targets(wolf.x, wolf.y)
+        # Free steps one closer, picked from the way rng.choice would pick from a list of them
+        steps = self.chase_steps
+        found = 0
+        for i in DIRECTION_INDEXES:
+            if targets >> i & 1:
+                dx, dy = DIRECTIONS[i]
+                if (field.distance(wolf.x + dx, wolf.y + dy) == here - 1 and
+                        self.is_position_free(wolf.x + dx, wolf.y + dy, wolf)):
+                    steps[found] = i
+                    found += 1
+        if found:
+            dx, dy = DIRECTIONS[steps[draw_below(self.rng, found)]]
+            return (wolf.x + dx, wolf.y + dy)
+        return (wolf.x, wolf.y)  # Path is blocked by another animal, wait for it to clear
+
     def move_wolf(self, wolf):
         # 80% chance to chase player, 20% chance to move randomly
-        if random.random() < 0.8:
-            # Chase player with some randomness
+        chase = self.rng.random() < 0.8
+        step = self.chase_step(wolf) if chase and self.pathfinding else None
+        if step is not None:
+            new_x, new_y = step
+        elif chase:
+            # Too far for the distance field (or pathfinding is off): steer straight at the player
             dx = 0 if self.player_pos[0] == wolf.x else (1 if self.player_pos[0] > wolf.x else -1)
             dy = 0 if self.player_pos[1] == wolf.y else (1 if self.player_pos[1] > wolf.y else -1)
             
             # 30% chance to only move in one direction instead of both
-            if random.random() < 0.3 and dx != 0 and dy != 0:
-                if random.random() < 0.5:
+            if self.rng.random() < 0.3 and dx != 0 and dy != 0:
+                if self.rng.random() < 0.5:
                     dy = 0  # Only move horizontally
                 else:
                     dx = 0  # Only move vertically
             
             # 10% chance to move in a random perpendicular direction
-            if random.random() < 0.1:
+            if self.rng.random() < 0.1:
                 if dx != 0:
                     dx = 0
-                    dy = random.choice([-1, 1])
+                    dy = self.rng.choice(SIDESTEPS)
                 else:
                     dy = 0
-                    dx = random.choice([-1, 1])
+                    dx = self.rng.choice(SIDESTEPS)
             
             new_x = wolf.x + dx
             new_y = wolf.y + dy
         else:
             # Random movement like other animals
-            dx = random.choice([-1, 0, 1])
-            dy = random.choice([-1, 0, 1])
+            dx = self.rng.choice(STEPS)
+            dy = self.rng.choice(STEPS)
             new_x = wolf.x + dx
             new_y = wolf.y + dy
         
         # Check if move is valid
-        if self.is_position_free(new_x, new_y, wolf) and not self.is_near_wall(new_x, new_y):
-            wolf.x = new_x
-            wolf.y = new_y
+        if self.is_walkable(new_x, new_y) and self.is_position_free(new_x, new_y, wolf):
+            self.move_entity(wolf, new_x, new_y)
         
         # Check if wolf caught player
         if (abs(wolf.x - self.player_pos[0]) <= 1 and 
@@ -232,57 +1631,308 @@ class World:
             self.game_over_message = "💀 GAME OVER! The wolf got you! 💀"
 
     def update_hunger(self):
-        current_time = time.time()
+        current_time = self.clock()
         if current_time - self.last_move_time >= 1:  # Decrease hunger every second
             self.player_hunger = max(0, self.player_hunger - 0.5)  # Reduced hunger decay
             self.last_move_time = current_time
 
+    def step(self, action=None):
+        """Apply one action (see ACTIONS, or None to wait) and advance the world one tick"""
+        ate = None
+        huff = None
+        if action == 'quit':
+            return StepResult(self.ticks, action, 'quit', self.player_hunger, ate, huff)
+        if action == 'eat':
+            ate = self.eat_nearby_animal()
+        elif action == 'huff':
+            huff = self.huff_and_puff()
+        elif action is not None:
+            self.move_player(*ACTIONS[action])
+
+        self.update_animals()
+        self.ticks += 1
+        if isinstance(self.clock, TickClock):
+            self.clock.advance()
+        self.update_hunger()
+        return StepResult(self.ticks, action, self.status(), self.player_hunger, ate, huff)
+
+    def status(self):
+        """'won', 'caught', 'starved' or 'playing', checked in the order main always has"""
+        if self.check_win_condition():
+            return 'won'
+        if self.game_over:
+            return 'caught'
+        if self.player_hunger <= 0:
+            return 'starved'
+        return 'playing'
+
+    def snapshot(self):
+        """Copy of everything step() reads or changes, for restore()"""
+        if self.entity_store is not None:
+            raise ValueError("snapshots of entity_store worlds aren't supported")
+        return {
+            'world_map': bytes(self.world_map),
+            'animals': [(animal.x, animal.y, animal.species, animal.speed, animal.move_counter)
+                        for animal in self.animals],
+            'player_pos': list(self.player_pos),
+            'player_hunger': self.player_hunger,
+            'ticks': self.ticks,
+            'clock': self.clock.now if isinstance(self.clock, TickClock) else None,
+            'last_move_time': self.last_move_time,
+            'flags': (self.game_won, self.game_over, self.game_over_message, self.can_huff),
+            'rng': self.rng.getstate(),
+        }
+
+    def restore(self, state):
+        """Put the world back the way snapshot() found it"""
+        if self.world_map != state['world_map']:
+            self.world_map[:] = state['world_map']
+            self.build_walkability()
+        self.free_cells = None  # rebuilt by the next spawn, once the player is back in place
+        self.clear_animals()
+        for x, y, species, speed, move_counter in state['animals']:
+            self.add_entity(Entity(x, y, species, speed)).move_counter = move_counter
+        self.player_pos = list(state['player_pos'])
+        self.player_hunger = state['player_hunger']
+        self.ticks = state['ticks']
+        if state['clock'] is not None:
+            self.clock.now = state['clock']
+        self.last_move_time = state['last_move_time']
+        self.game_won, self.game_over, self.game_over_message, self.can_huff = state['flags']
+        self.rng.setstate(state['rng'])
+
+    def hash_terrain(self, crc):
+        return zlib.crc32(self.world_map, crc)
+
+    def save(self, path):
+        """Write the whole world to `path`: terrain, animals, player, flags, clock and RNG.
+
+        The file is SAVE_MAGIC, a version, then a table of (tag, offset, length)
+        sections: META (JSON scalars), TERR (tile bytes), WALK and NEAR (walkability
+        tables, so loading needn't rebuild them), ENTS (animal columns) and RAND
+        (the RNG's Mersenne Twister words). Numbers are little-endian.
+        """
+        animals = self.animals
+        symbols = list(dict.fromkeys(animal.symbol for animal in animals))
+        kind = {symbol: i for i, symbol in enumerate(symbols)}
+        entities = bytearray(struct.pack('<I', len(animals)))
+        for column in ('x', 'y', 'speed', 'move_counter'):
+            entities += little_endian(array('i', [getattr(animal, column) for animal in animals]))
+        entities += array('B', [kind[animal.symbol] for animal in animals])
+        rng_version, rng_words, gauss_next = self.rng.getstate()
+        meta = {
+            'width': self.width,
+            'height': self.height,
+            'level': self.level,
+            'hero': [self.hero_name, self.hero_symbol],
+            'seed': self.seed if isinstance(self.seed, (int, str)) else None,
+            'ticks': self.ticks,
+            'balance': self.balance,
+            'pathfinding': self.pathfinding,
+            'prey_flee': self.prey_flee,
+            'terrain': self.terrain,
+            'entity_store': self.entity_store is not None,
+            'player_pos': list(self.player_pos),
+            'player_hunger': self.player_hunger,
+            'clock': self.clock(),
+            'seconds_per_tick': self.clock.seconds_per_tick if isinstance(self.clock, TickClock) else None,
+            'last_move_time': self.last_move_time,
+            'game_won': self.game_won,
+            'game_over': self.game_over,
+            'game_over_message': self.game_over_message,
+            'can_huff': self.can_huff,
+            'symbols': symbols,
+            'rng_version': rng_version,
+            'gauss_next': gauss_next,
+            'np_rng': self.entity_store.np_rng.bit_generator.state if self.entity_store is not None else None,
+        }
+        write_sections(path, [
+            (b'META', json.dumps(meta).encode()),
+            (b'TERR', self.world_map),
+            (b'WALK', self.walkable),
+            (b'NEAR', self.near_wall),
+            (b'ENTS', entities),
+            (b'RAND', little_endian(array('I', rng_words))),
+        ])
+
+    @classmethod
+    def load(cls, path, clock=None):
+        """World from a save() file, ready to step. Unknown sections and keys are skipped.
+
+        Pass `clock` to run it on something else than the clock it was saved with
+        (a TickClock picks up where it stopped; wall clocks keep hunger timing).
+        """
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size > MMAP_SAVES_OVER:
+                # Copy-on-write: the terrain tables below stay views of the file until edited,
+                # and keep the mapping open for as long as the world uses them
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+            else:
+                data = bytearray(size)
+                f.readinto(data)
+        sections = read_sections(data)
+        meta = json.loads(bytes(sections[b'META']))
+        world = cls.__new__(cls)
+        world.width = width = meta['width']
+        world.height = height = meta['height']
+        world.level = meta['level']
+        world.hero_name, world.hero_symbol = meta['hero']
+        world.seed = meta.get('seed')
+        world.ticks = meta.get('ticks', 0)
+        world.balance = dict(DEFAULT_BALANCE, **meta.get('balance', {}))
+        world.blocks = world.make_blocks()
+        seconds_per_tick = meta.get('seconds_per_tick')
+        resumed = clock is None and seconds_per_tick is not None  # the saved TickClock carries on
+        if clock is None:
+            clock = TickClock(seconds_per_tick) if seconds_per_tick is not None else time.time
+            if resumed:
+                clock.now = meta['clock']
+        world.clock = clock
+
+        # Writable memoryviews into the file's bytes, used as they are instead of copied
+        world.world_map = sections[b'TERR']
+        if len(sections.get(b'WALK', b'')) == len(sections.get(b'NEAR', b'')) == width * height:
+            world.walkable = sections[b'WALK']
+            world.near_wall = sections[b'NEAR']
+            world.move_targets = array('H', [UNKNOWN_TARGETS]) * (width * height)
+            world.terrain_version = 0
+        else:
+            world.build_walkability()
+        world.rng = random.Random()
+        world.entity_store = world.new_entity_store() if meta.get('entity_store') else None
+        world.occupancy = world.entity_store or world.new_occupancy()
+        world.camera = world.new_camera()
+        world.player_pos = list(meta['player_pos'])
+        world.pathfinding = meta.get('pathfinding', True)
+        world.prey_flee = meta.get('prey_flee', False)
+        world.terrain = meta.get('terrain', 'classic')
+        world.distance_field = DistanceField(world)
+        world.make_scratch()
+        world.player_hunger = meta['player_hunger']
+
+        entities = sections[b'ENTS']
+        count = struct.unpack_from('<I', entities)[0]
+        columns = []
+        for i in range(4):
+            column = array('i')
+            column.frombytes(entities[4 + i * 4 * count:4 + (i + 1) * 4 * count])
+            columns.append(little_endian(column))
+        kinds = entities[4 + 16 * count:4 + 17 * count]
+        symbols = meta['symbols']
+        # The occupancy index is new and empty; clear_animals() would only clear it again
+        world.animals = []
+        world.species_counts = [0] * len(SPECIES)
+        # Thousands of new objects next to a multi-million cell grid: keep the
+        # collector from walking that grid over and over while they are made
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            for x, y, speed, move_counter, kind in zip(*columns, kinds):
+                world.add_entity(Entity(x, y, symbols[kind], speed)).move_counter = move_counter
+        finally:
+            if collecting:
+                gc.enable()
+
+        # After EntityStore(), which takes its seed from the RNG
+        words = array('I')
+        words.frombytes(sections[b'RAND'])
+        world.rng.setstate((meta['rng_version'], tuple(little_endian(words)), meta['gauss_next']))
+        if world.entity_store is not None:
+            world.entity_store.np_rng.bit_generator.state = meta['np_rng']
+        if resumed:
+            world.last_move_time = meta['last_move_time']
+        else:
+            # Hunger keeps ticking as if the clock had never stopped
+            world.last_move_time = meta['last_move_time'] + world.clock() - meta['clock']
+        world.game_won = meta.get('game_won', False)
+        world.game_over = meta.get('game_over', False)
+        world.game_over_message = meta.get('game_over_message', "")
+        world.can_huff = meta.get('can_huff', True)
+        return world
+
+    def state_hash(self):
+        """CRC32 of the terrain, animals, player, clock and RNG: equal hashes, equal futures"""
+        crc = self.hash_terrain(0)
+        numbers = array('q', [self.ticks, *self.player_pos])
+        for animal in self.animals:
+            numbers.extend((animal.x, animal.y, animal.speed, animal.move_counter))
+        crc = zlib.crc32(numbers, crc)
+        crc = zlib.crc32(''.join(animal.symbol for animal in self.animals).encode(), crc)
+        clock = self.clock.now if isinstance(self.clock, TickClock) else 0.0
+        crc = zlib.crc32(struct.pack('<ddd???', self.player_hunger, clock, self.last_move_time,
+                                     self.game_won, self.game_over, self.can_huff), crc)
+        crc = zlib.crc32(array('Q', self.rng.getstate()[1]), crc)
+        if self.entity_store is not None:
+            crc = zlib.crc32(repr(self.entity_store.np_rng.bit_generator.state).encode(), crc)
+        return crc
+
     def check_win_condition(self):
         # Count only prey animals (not the wolf)
-        prey_remaining = sum(1 for animal in self.animals 
-                           if animal.symbol in [self.blocks['rabbit'], self.blocks['squirrel']])
-        return prey_remaining == 0
+        return self.prey_remaining() == 0
 
-    def draw(self):
-        os.system('cls' if os.name == 'nt' else 'clear')
-        
-        display_world = [row[:] for row in self.world_map]
-        
-        for animal in self.animals:
-            display_world[animal.y][animal.x] = animal.symbol
-        
-        # If game over by wolf, show skull instead of bat
-        if self.game_over and "wolf got you" in self.game_over_message.lower():
-            display_world[self.player_pos[1]][self.player_pos[0]] = '💀'
-        else:
-            display_world[self.player_pos[1]][self.player_pos[0]] = self.blocks['player']
-        
-        print('=' * (self.width + 2))
-        for row in display_world:
-            line = ''.join(row)
-            print(f"|{line}|")
-        print('=' * (self.width + 2))
-        
+    def terrain_row(self, y, left, right):
+        """Glyphs of tiles left <= x < right in row y, translated in one C-level pass"""
+        start = y * self.width
+        return str(self.world_map[start + left:start + right], 'latin-1').translate(TILE_TRANSLATION)
+
+    def compose_map(self, player_at=None, player_glyph=None):
+        """The camera's window with animals and the player drawn in, as bordered renderer lines.
+
+        The lines are the camera's and get refilled by the next call, so copy them to keep them.
+        """
+        camera = self.camera
+        left, top = camera.follow(self.player_pos[0], self.player_pos[1], self)
+        right = left + camera.view_width
+        bottom = top + camera.view_height
+        display_world = camera.frame_lines()
+        for row, cells in enumerate(camera.terrain_rows(self), 1):
+            display_world[row][:] = cells
+
+        # Line 0 is the top border and cell 0 of each line the left one
+        for animal in self.occupancy.within(left, top, right, bottom):
+            display_world[animal.y - top + 1][animal.x - left + 1] = animal.symbol
+
+        px, py = player_at or self.player_pos
+        if player_glyph is None:
+            # If game over by wolf, show skull instead of bat
+            if self.game_over and "wolf got you" in self.game_over_message.lower():
+                player_glyph = '💀'
+            else:
+                player_glyph = self.blocks['player']
+        if left <= px < right and top <= py < bottom:
+            display_world[py - top + 1][px - left + 1] = player_glyph
+        return display_world
+
+    def hud_lines(self):
         filled_blocks = int(self.player_hunger // 10)
         empty_blocks = 10 - filled_blocks
-        hunger_bar = f"Hunger: {'█' * filled_blocks}{'-' * empty_blocks}"
-        print(f"\nLevel {self.level} - {self.hero_name}")
-        print(f"Hunger: {'█' * filled_blocks}{'-' * empty_blocks} ({int(self.player_hunger)}%)")
-        
-        rabbits = sum(1 for animal in self.animals if animal.symbol == self.blocks['rabbit'])
-        squirrels = sum(1 for animal in self.animals if animal.symbol == self.blocks['squirrel'])
-        wolves = sum(1 for animal in self.animals if animal.symbol == self.blocks['wolf'])
-        print(f"Rabbits remaining: {rabbits}")
-        print(f"Squirrels remaining: {squirrels}")
-        print(f"Wolves hunting you: {wolves}")
-        print("\nControls: Arrow keys to move, SPACE to eat nearby animals, H to huff and puff, Q to quit")
+        rabbits = self.count_of('rabbit')
+        squirrels = self.count_of('squirrel')
+        wolves = self.count_of('wolf')
+        hud = [
+            "",
+            f"Level {self.level} - {self.hero_name}",
+            f"Hunger: {'█' * filled_blocks}{'-' * empty_blocks} ({int(self.player_hunger)}%)",
+            f"Rabbits remaining: {rabbits}",
+            f"Squirrels remaining: {squirrels}",
+            f"Wolves hunting you: {wolves}",
+            "",
+            "Controls: Arrow keys to move, SPACE to eat nearby animals, H to huff and puff, Q to quit",
+        ]
         
         # Add wolf warning if nearby
-        for animal in self.animals:
-            if (animal.symbol == self.blocks['wolf'] and 
-                abs(animal.x - self.player_pos[0]) <= 3 and 
-                abs(animal.y - self.player_pos[1]) <= 3):
-                print("\n⚠️ WARNING: Wolf nearby! ⚠️")
+        if any(self.occupancy.near(self.player_pos[0], self.player_pos[1], 3, WOLF.id)):
+            hud += ["", "⚠️ WARNING: Wolf nearby! ⚠️"]
+        return hud
+
+    def draw(self, screen=SCREEN, messages=()):
+        hud = self.hud_lines()
+        if messages:
+            hud += [""] + list(messages)
+        if self.camera.fit(self, screen.size(), len(hud)):
+            screen.reset()  # first frame, or the terminal was resized
+        screen.render(self.compose_map() + [[text] for text in hud])
 
     def move_player(self, dx, dy):
         new_x = self.player_pos[0] + dx
@@ -291,15 +1941,18 @@ class World:
         # First check if we can move to the new position
         if (0 <= new_x < self.width and 
             0 <= new_y < self.height and 
-            self.world_map[new_y][new_x] == self.blocks['air']):
+            self.tile_at(new_x, new_y) == AIR):
             
             # Check if there's an animal in the way
-            for animal in self.animals:
-                if animal.x == new_x and animal.y == new_y:
-                    return  # Can't move into animal's space
+            if self.occupancy.at(new_x, new_y) is not None:
+                return  # Can't move into animal's space
             
             # If no animal blocking, move player
+            old_x, old_y = self.player_pos
             self.player_pos = [new_x, new_y]
+            if self.free_cells is not None:
+                self.recheck_free_cell(old_x, old_y)
+                self.free_cells.discard(new_y * self.width + new_x)
             self.player_hunger = max(0, self.player_hunger - 1)  # Movement still costs hunger
 
     def eat_nearby_animal(self):
@@ -308,106 +1961,77 @@ class World:
         py = self.player_pos[1]
         
         # Check all adjacent positions including diagonals
-        for animal in self.animals[:]:
-            # Calculate true distance, accounting for emoji width
-            dx = abs(animal.x - px)
-            dy = abs(animal.y - py)
-            
-            # If within one space in any direction
-            if dx <= 1.5 and dy <= 1:
-                # 50% chance of escape
-                if random.random() < 0.5:
-                    # Calculate escape direction (opposite of player)
-                    escape_dx = animal.x - px
-                    escape_dy = animal.y - py
-                    
-                    # Normalize to get direction
-                    if escape_dx != 0:
-                        escape_dx = escape_dx // abs(escape_dx)
-                    if escape_dy != 0:
-                        escape_dy = escape_dy // abs(escape_dy)
-                    
-                    # Try to escape
-                    new_x = animal.x + escape_dx
-                    new_y = animal.y + escape_dy
-                    
-                    # Check if escape position is valid
-                    if (0 <= new_x < self.width and 
-                        0 <= new_y < self.height and 
-                        self.world_map[new_y][new_x] == self.blocks['air'] and
-                        not self.is_near_wall(new_x, new_y)):
-                        animal.x = new_x
-                        animal.y = new_y
+        for animal in self.occupancy.near(px, py, 1):
+            # 50% chance of escape
+            if self.rng.random() < self.balance['escape_chance']:
+                # Calculate escape direction (opposite of player)
+                escape_dx = animal.x - px
+                escape_dy = animal.y - py
                 
-                    # Whether escape was successful or not, it counts as a miss
-                    self.player_hunger = max(0, self.player_hunger - 10)
-                    return False
+                # Normalize to get direction
+                if escape_dx != 0:
+                    escape_dx = escape_dx // abs(escape_dx)
+                if escape_dy != 0:
+                    escape_dy = escape_dy // abs(escape_dy)
                 
-                # If didn't try to escape, get eaten
-                self.animals.remove(animal)
-                hunger_boost = 40 if animal.symbol == self.blocks['rabbit'] else 25
-                self.player_hunger = min(100, self.player_hunger + hunger_boost)
-                return True
+                # Try to escape
+                new_x = animal.x + escape_dx
+                new_y = animal.y + escape_dy
+                
+                # Check if escape position is valid (and not onto another animal)
+                if (self.is_walkable(new_x, new_y) and
+                    self.is_position_free(new_x, new_y, animal)):
+                    self.move_entity(animal, new_x, new_y)
+            
+                # Whether escape was successful or not, it counts as a miss
+                self.player_hunger = max(0, self.player_hunger - 10)
+                return False
+            
+            # If didn't try to escape, get eaten
+            self.remove_entity(animal)
+            hunger_boost = SPECIES[animal.species].hunger_value
+            self.player_hunger = min(100, self.player_hunger + hunger_boost)
+            return True
         
         # No animal in range - costs hunger
         self.player_hunger = max(0, self.player_hunger - 10)
         return False
 
-    def show_game_over_animation(self):
+    async def show_game_over_animation(self, screen=SCREEN):
         # Find ground level at player's x position
         ground_y = self.player_pos[1]
-        while ground_y < self.height and self.world_map[ground_y][self.player_pos[0]] == self.blocks['air']:
+        while ground_y < self.height and self.tile_at(self.player_pos[0], ground_y) == AIR:
             ground_y += 1
         
         # Animate falling
         fall_y = self.player_pos[1]
         while fall_y < ground_y - 1:  # Stop one above ground
-            os.system('cls' if os.name == 'nt' else 'clear')
-            
-            # Create display world
-            display_world = [row[:] for row in self.world_map]
-            
-            # Add animals
-            for animal in self.animals:
-                display_world[animal.y][animal.x] = animal.symbol
-            
-            # Add falling player
-            display_world[fall_y][self.player_pos[0]] = self.blocks['player']
+            # Create display world with the falling player
+            display_world = self.compose_map((self.player_pos[0], fall_y), self.blocks['player'])
             
-            # Draw the world
-            print('=' * (self.width + 2))
-            for row in display_world:
-                line = ''.join(row)
-                print(f"|{line}|")
-            print('=' * (self.width + 2))
-            
-            # Draw final stats
-            print(f"\nHunger: {'█' * 0}{'-' * 10} (0%)")
-            print(f"Rabbits remaining: {sum(1 for animal in self.animals if animal.symbol == self.blocks['rabbit'])}")
-            print(f"Squirrels remaining: {sum(1 for animal in self.animals if animal.symbol == self.blocks['squirrel'])}")
+            # Draw the world and final stats
+            hud = [
+                "",
+                f"Hunger: {'█' * 0}{'-' * 10} (0%)",
+                f"Rabbits remaining: {self.count_of('rabbit')}",
+                f"Squirrels remaining: {self.count_of('squirrel')}",
+            ]
+            screen.render(display_world + [[text] for text in hud])
             
             fall_y += 1
-            time.sleep(0.2)  # Slow down the falling animation
+            await asyncio.sleep(0.2)  # Slow down the falling animation
         
         # Final position with dramatic message
-        os.system('cls' if os.name == 'nt' else 'clear')
-        display_world = [row[:] for row in self.world_map]
-        for animal in self.animals:
-            display_world[animal.y][animal.x] = animal.symbol
-        display_world[ground_y - 1][self.player_pos[0]] = '💀'  # Change to skull when dead
+        # Change to skull when dead
+        display_world = self.compose_map((self.player_pos[0], ground_y - 1), '💀')
         
-        print('=' * (self.width + 2))
-        for row in display_world:
-            line = ''.join(row)
-            print(f"|{line}|")
-        print('=' * (self.width + 2))
-        
-        print(f"\n💀 GAME OVER! {self.hero_name} has starved! 💀")
-        time.sleep(2)  # Pause to show final message
+        hud = ["", f"💀 GAME OVER! {self.hero_name} has starved! 💀"]
+        screen.render(display_world + [[text] for text in hud])
+        await asyncio.sleep(2)  # Pause to show final message
 
     def huff_and_puff(self):
-        # Find all wolves
-        wolves = [animal for animal in self.animals if animal.symbol == self.blocks['wolf']]
+        # Find all wolves (moving them doesn't change the roster)
+        wolves = self.occupancy.roster(WOLF.id)
         if not wolves:
             return "No wolves in sight!"
             
@@ -432,8 +2056,8 @@ class World:
                 blow_distance = 1  # Very weak at very long range
             
             # Normalize direction
-            dir_x = dx/max(abs(dx), 1) if dx != 0 else 0
-            dir_y = dy/max(abs(dy), 1) if dy != 0 else 0
+            dir_x = (dx > 0) - (dx < 0)
+            dir_y = (dy > 0) - (dy < 0)
             
             # Try to blow wolf away
             success = False
@@ -441,8 +2065,8 @@ class World:
                 if success:
                     break
                     
-                new_x = wolf.x + int(dir_x * test_distance)
-                new_y = wolf.y + int(dir_y * test_distance)
+                new_x = wolf.x + dir_x * test_distance
+                new_y = wolf.y + dir_y * test_distance
                 
                 # Try positions around the target point
                 for offset_x in [0, -1, 1]:
@@ -452,13 +2076,10 @@ class World:
                         test_x = new_x + offset_x
                         test_y = new_y + offset_y
                         
-                        if (0 <= test_x < self.width and 
-                            0 <= test_y < self.height and 
-                            self.is_position_free(test_x, test_y, wolf) and 
-                            not self.is_near_wall(test_x, test_y)):
+                        if (self.is_walkable(test_x, test_y) and 
+                            self.is_position_free(test_x, test_y, wolf)):
                             # Found a valid position!
-                            wolf.x = test_x
-                            wolf.y = test_y
+                            self.move_entity(wolf, test_x, test_y)
                             wolves_blown += 1
                             total_distance = max(total_distance, blow_distance)
                             success = True
@@ -468,14 +2089,455 @@ class World:
             return "No clear path to blow wolves!"
             
         # Cost hunger only once, even if blowing multiple wolves
-        self.player_hunger = max(0, self.player_hunger - 20)
-        
-        # Add debug information
-        print(f"DEBUG: Blown {wolves_blown} out of {len(wolves)} wolves")
+        self.player_hunger = max(0, self.player_hunger - self.balance['huff_cost'])
         
         return f"success:{total_distance}:{wolves_blown}"
 
-def show_victory_celebration(width, height):
+class Chunk:
+    """One CHUNK_SIZE square of a chunked world: its tiles plus lazily filled walkability caches"""
+    def __init__(self, tiles, modified=False):
+        self.tiles = tiles  # CHUNK_SIZE rows of CHUNK_SIZE tile IDs, padded with AIR past the map's edges
+        self.modified = modified  # edited since it was generated, so keep it when evicted
+        size = CHUNK_SIZE * CHUNK_SIZE
+        self.walkable = bytearray(b'\x02') * size  # 2 = not worked out yet
+        self.move_targets = array('H', [UNKNOWN_TARGETS]) * size
+
+class ChunkedMap:
+    """Stands in for world_map in a ChunkedWorld.
+
+    Chunks are generated on first touch, deterministically from the world seed and
+    the column. They are kept in order of when the player was last near them (an
+    animal wandering about doesn't count), and evict() drops the ones the player
+    left longest ago once over the cap. Edited chunks are saved and come back as
+    they were left.
+    """
+    def __init__(self, world, max_chunks):
+        self.world = world
+        self.max_chunks = max_chunks
+        self.chunks = OrderedDict()  # (cx, cy) -> Chunk, longest since the player was near first
+        self.saved = {}  # (cx, cy) -> tiles of edited chunks that were evicted
+        self.generated = 0
+        self.evicted = 0
+
+    def chunk(self, cx, cy):
+        key = (cx, cy)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            if key in self.saved:
+                chunk = Chunk(self.saved.pop(key), modified=True)
+            else:
+                chunk = Chunk(self.world.generate_chunk(cx, cy))
+                self.generated += 1
+            self.chunks[key] = chunk
+            self.world.chunk_loaded(key)
+        return chunk
+
+    def __getitem__(self, index):
+        # Flat row-major index, so World code can treat this like its bytearray
+        y, x = divmod(index, self.world.width)
+        return self.tile(x, y)
+
+    def tile(self, x, y):
+        return self.chunk(x // CHUNK_SIZE, y // CHUNK_SIZE).tiles[(y % CHUNK_SIZE) * CHUNK_SIZE + x % CHUNK_SIZE]
+
+    def set(self, x, y, tile):
+        chunk = self.chunk(x // CHUNK_SIZE, y // CHUNK_SIZE)
+        chunk.tiles[(y % CHUNK_SIZE) * CHUNK_SIZE + x % CHUNK_SIZE] = tile
+        chunk.modified = True
+
+    def evict(self, keep):
+        """Load or mark as just used `keep` (the chunks around the player), then drop the stalest over the cap"""
+        for key in keep:
+            if key in self.chunks:
+                self.chunks.move_to_end(key)
+            else:
+                self.chunk(*key)  # so animals asleep in it wake up
+        if len(self.chunks) <= self.max_chunks:
+            return
+        for key in list(self.chunks):
+            if len(self.chunks) <= self.max_chunks:
+                break
+            if key in keep:
+                continue
+            chunk = self.chunks.pop(key)
+            if chunk.modified:
+                self.saved[key] = chunk.tiles
+            self.evicted += 1
+            self.world.chunk_evicted(key)
+
+class ChunkedWorld(World):
+    """World whose terrain is made chunk by chunk as the player explores.
+
+    Only chunks near the player stay resident (up to max_chunks); animals standing
+    in an evicted chunk are suspended and wake up when it is loaded again. The
+    camera shows a view_width x view_height window around the player.
+    """
+    def __init__(self, width=100000, height=200, max_chunks=256, active_radius=2,
+                 view_width=40, view_height=20, **options):
+        if options.get('entity_store'):
+            raise ValueError("ChunkedWorld doesn't support the array entity store")
+        if options.get('terrain', 'classic') != 'classic':
+            raise ValueError("ChunkedWorld only makes classic terrain")
+        self.max_chunks = max_chunks
+        self.active_radius = active_radius  # chunks this close to the player are never evicted
+        self.view_width = view_width
+        self.view_height = view_height
+        self.suspended = {}  # (cx, cy) -> animals asleep in that evicted chunk
+        self.waking = []  # animals whose chunk came back, re-added at the next tick
+        # Animals per species id in suspended or waking, which the HUD and the win check still count
+        self.offstage_counts = [0] * len(SPECIES)
+        self.active = (None, None, frozenset())  # player chunk and the chunk keys around it
+        super().__init__(width=width, height=height, **options)
+
+    def generate_world(self):
+        # Chunk contents only depend on this seed, not on the order chunks are visited
+        self.world_seed = self.seed if self.seed is not None else self.rng.getrandbits(32)
+        return ChunkedMap(self, self.max_chunks)
+
+    def generate_chunk(self, cx, cy):
+        """Same terrain rules as generate_world, with one RNG per column"""
+        left = cx * CHUNK_SIZE
+        top = cy * CHUNK_SIZE
+        columns = range(left, min(left + CHUNK_SIZE, self.width))
+        rows = range(top, min(top + CHUNK_SIZE, self.height))
+        tiles = bytearray(CHUNK_SIZE * CHUNK_SIZE)
+        ground_height = self.height - 3
+        for i, x in enumerate(columns):
+            column_rng = random.Random(f"{self.world_seed}:{x}")
+            current_height = ground_height + column_rng.randint(-1, 1)
+            tree = column_rng.random() < 0.1 and current_height > 0  # 10% chance
+            stone = column_rng.random() < 0.2  # 20% chance
+            for j, y in enumerate(rows):
+                if y == current_height and stone:
+                    tiles[j * CHUNK_SIZE + i] = STONE
+                elif y >= current_height:
+                    tiles[j * CHUNK_SIZE + i] = GRASS
+                elif y == current_height - 1 and tree:
+                    tiles[j * CHUNK_SIZE + i] = TREE
+        return tiles
+
+    def new_occupancy(self):
+        return SparseOccupancy(self.width, self.height)
+
+    def new_camera(self):
+        return Camera(self.view_width, self.view_height)
+
+    def build_walkability(self):
+        # Walkability lives in each chunk and is worked out cell by cell on demand
+        self.terrain_version = getattr(self, 'terrain_version', -1) + 1
+
+    def tile_at(self, x, y):
+        return self.world_map.tile(x, y)
+
+    def is_near_wall(self, x, y):
+        return self._scan_near_wall(x, y)
+
+    def is_walkable(self, x, y):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return False
+        chunk = self.world_map.chunk(x // CHUNK_SIZE, y // CHUNK_SIZE)
+        index = (y % CHUNK_SIZE) * CHUNK_SIZE + x % CHUNK_SIZE
+        walkable = chunk.walkable[index]
+        if walkable == 2:
+            walkable = int(chunk.tiles[index] == AIR and not self._scan_near_wall(x, y))
+            chunk.walkable[index] = walkable
+        return walkable == 1
+
+    def get_move_targets(self, x, y):
+        chunk = self.world_map.chunk(x // CHUNK_SIZE, y // CHUNK_SIZE)
+        index = (y % CHUNK_SIZE) * CHUNK_SIZE + x % CHUNK_SIZE
+        targets = chunk.move_targets[index]
+        if targets == UNKNOWN_TARGETS:
+            targets = 0
+            for i, (dx, dy) in enumerate(DIRECTIONS):
+                if self.is_walkable(x + dx, y + dy):
+                    targets |= 1 << i
+            chunk.move_targets[index] = targets
+        return targets
+
+    def set_tile(self, x, y, tile):
+        self.world_map.set(x, y, tile)
+        # Forget cached walkability around the edit in every loaded chunk it reaches
+        for check_y in range(max(0, y - 2), min(self.height, y + 3)):
+            for check_x in range(max(0, x - 2), min(self.width, x + 3)):
+                chunk = self.world_map.chunks.get((check_x // CHUNK_SIZE, check_y // CHUNK_SIZE))
+                if chunk is not None:
+                    index = (check_y % CHUNK_SIZE) * CHUNK_SIZE + check_x % CHUNK_SIZE
+                    chunk.walkable[index] = 2
+                    chunk.move_targets[index] = UNKNOWN_TARGETS
+        self.terrain_version += 1
+
+    def hash_terrain(self, crc):
+        # Untouched chunks are a pure function of the seed, only edits need hashing
+        edited = dict(self.world_map.saved)
+        edited.update((key, chunk.tiles) for key, chunk in self.world_map.chunks.items() if chunk.modified)
+        for key in sorted(edited):
+            crc = zlib.crc32(edited[key], zlib.crc32(struct.pack('<qq', *key), crc))
+        return crc
+
+    def snapshot(self):
+        raise ValueError("snapshots of chunked worlds aren't supported")
+
+    def save(self, path):
+        raise ValueError("chunked worlds can't be saved")
+
+    @classmethod
+    def load(cls, path, clock=None):
+        raise ValueError("chunked worlds can't be loaded")
+
+    def spawn_cells(self):
+        # Only around the player: indexing the whole map would generate all of it.
+        # Chunks come and go, so the box is indexed afresh for every spawn.
+        reach = (self.active_radius + 1) * CHUNK_SIZE - 1
+        px, py = self.player_pos
+        cells = [y * self.width + x
+                 for y in range(max(0, py - reach), min(self.height - 1, py + reach) + 1)
+                 for x in range(max(0, px - reach), min(self.width - 1, px + reach) + 1)
+                 if self.is_walkable(x, y) and self.is_position_free(x, y)]
+        return FreeCells(cells)
+
+    def active_chunks(self):
+        """Keys of the chunks within active_radius of the player's, leaving out any past the map's edges"""
+        pcx = self.player_pos[0] // CHUNK_SIZE
+        pcy = self.player_pos[1] // CHUNK_SIZE
+        if self.active[0] != pcx or self.active[1] != pcy:
+            columns = range(max(0, pcx - self.active_radius),
+                            min(-(-self.width // CHUNK_SIZE), pcx + self.active_radius + 1))
+            rows = range(max(0, pcy - self.active_radius),
+                         min(-(-self.height // CHUNK_SIZE), pcy + self.active_radius + 1))
+            self.active = (pcx, pcy, frozenset((cx, cy) for cx in columns for cy in rows))
+        return self.active[2]
+
+    def chunk_loaded(self, key):
+        # Don't touch self.animals here, a caller might be looping over it
+        self.waking.extend(self.suspended.pop(key, ()))
+
+    def chunk_evicted(self, key):
+        sleeping = [animal for animal in self.animals
+                    if (animal.x // CHUNK_SIZE, animal.y // CHUNK_SIZE) == key]
+        for animal in sleeping:
+            self.remove_entity(animal)
+            self.offstage_counts[animal.species] += 1
+        if sleeping:
+            self.suspended[key] = sleeping
+
+    def update_animals(self):
+        if self.waking:
+            still_waiting = []
+            for animal in self.waking:
+                if self.occupancy.at(animal.x, animal.y) is None:
+                    self.add_entity(animal)
+                    self.offstage_counts[animal.species] -= 1
+                else:
+                    still_waiting.append(animal)  # Someone wandered onto its cell, try next tick
+            self.waking = still_waiting
+
+        super().update_animals()
+        self.world_map.evict(self.active_chunks())
+
+    def count_of(self, name):
+        return super().count_of(name) + self.offstage_counts[SPECIES_BY_NAME[name].id]
+
+    def prey_remaining(self):
+        remaining = super().prey_remaining()
+        for species in SPECIES:
+            if species.prey:
+                remaining += self.offstage_counts[species.id]
+        return remaining
+
+    def terrain_row(self, y, left, right):
+        # Copy whole chunk row slices rather than fetching tile by tile
+        row = []
+        x = left
+        while x < right:
+            end = min(right, (x // CHUNK_SIZE + 1) * CHUNK_SIZE)
+            tiles = self.world_map.chunk(x // CHUNK_SIZE, y // CHUNK_SIZE).tiles
+            start = (y % CHUNK_SIZE) * CHUNK_SIZE + x % CHUNK_SIZE
+            row.append(tiles[start:start + end - x].decode('latin-1').translate(TILE_TRANSLATION))
+            x = end
+        return ''.join(row)
+
+class Recording:
+    """Seed and per-tick inputs of a game, enough to play it again exactly.
+
+    attach() starts a segment for a world (one per level) and logs every step it
+    takes, plus a state hash every `hash_every` ticks for Replay to check against.
+    On disk it is a JSON header followed by one byte per tick, with idle ticks
+    run-length encoded:
+
+        0x00-0x06   one tick, RECORDED_ACTIONS[byte]
+        0x80-0xff   (byte - 0x7f) idle ticks in a row
+        0x10 <I     state hash after the last tick
+        0x11 <HQ    new segment: level, seed
+        0x12        the player quit here
+    """
+    MAGIC = b'KPREC'
+    # Replays re-run the world's RNG draws. Shuffles and chase picks call getrandbits
+    # through draw_below rather than Random._randbelow, with the same draws, so
+    # version 1 recordings made before that still replay.
+    VERSION = 1
+
+    def __init__(self, hero, seconds_per_tick=0.2, options=None, hash_every=10):
+        self.hero = tuple(hero)
+        self.seconds_per_tick = seconds_per_tick
+        self.options = dict(options or {})  # other World keyword arguments
+        self.hash_every = hash_every
+        self.segments = []  # {'level', 'seed', 'actions': bytearray, 'hashes': {tick: crc}, 'quit'}
+
+    def attach(self, world):
+        if not isinstance(world.seed, int) or not 0 <= world.seed < 2 ** 64:
+            raise ValueError("only worlds with an integer seed can be recorded")
+        if world.ticks:
+            raise ValueError("recordings have to start from a fresh world")
+        segment = {'level': world.level, 'seed': world.seed, 'actions': bytearray(), 'hashes': {},
+                   'quit': False}
+        self.segments.append(segment)
+        actions = segment['actions']
+        hashes = segment['hashes']
+        codes = {action: code for code, action in enumerate(RECORDED_ACTIONS)}
+        step = world.step
+
+        def recorded_step(action=None):
+            result = step(action)
+            if action == 'quit':
+                segment['quit'] = True
+                return result
+            actions.append(codes[action])
+            if result.tick % self.hash_every == 0 or result.status != 'playing':
+                hashes[result.tick] = world.state_hash()
+            return result
+        world.step = recorded_step
+
+    def new_world(self, index):
+        """Fresh world for segment `index`, as it was when recording started"""
+        segment = self.segments[index]
+        return World(level=segment['level'], hero=self.hero, seed=segment['seed'],
+                     clock=TickClock(self.seconds_per_tick), **self.options)
+
+    def to_bytes(self):
+        header = json.dumps({'hero': self.hero, 'seconds_per_tick': self.seconds_per_tick,
+                             'options': self.options, 'hash_every': self.hash_every}).encode()
+        out = bytearray(self.MAGIC)
+        out += struct.pack('<BI', self.VERSION, len(header)) + header
+        for segment in self.segments:
+            out += b'\x11' + struct.pack('<HQ', segment['level'], segment['seed'])
+            hashes = segment['hashes']
+            idle = 0
+            for tick, code in enumerate(segment['actions'], 1):
+                if code == 0 and tick not in hashes:
+                    idle += 1
+                    if idle == 128:
+                        out.append(0xff)
+                        idle = 0
+                    continue
+                if idle:
+                    out.append(0x7f + idle)
+                    idle = 0
+                out.append(code)
+                if tick in hashes:
+                    out += b'\x10' + struct.pack('<I', hashes[tick])
+            if idle:
+                out.append(0x7f + idle)
+            if segment['quit']:
+                out.append(0x12)
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if data[:len(cls.MAGIC)] != cls.MAGIC:
+            raise ValueError("not a recording")
+        pos = len(cls.MAGIC)
+        version, size = struct.unpack_from('<BI', data, pos)
+        if version > cls.VERSION:
+            raise ValueError(f"recording format {version} is newer than this game understands ({cls.VERSION})")
+        pos += 5
+        header = json.loads(data[pos:pos + size])
+        pos += size
+        recording = cls(header['hero'], header['seconds_per_tick'], header['options'], header['hash_every'])
+        segment = None
+        while pos < len(data):
+            byte = data[pos]
+            pos += 1
+            if byte >= 0x80:
+                segment['actions'].extend(bytes(byte - 0x7f))
+            elif byte < len(RECORDED_ACTIONS):
+                segment['actions'].append(byte)
+            elif byte == 0x10:
+                segment['hashes'][len(segment['actions'])] = struct.unpack_from('<I', data, pos)[0]
+                pos += 4
+            elif byte == 0x11:
+                level, seed = struct.unpack_from('<HQ', data, pos)
+                pos += 10
+                segment = {'level': level, 'seed': seed, 'actions': bytearray(), 'hashes': {}, 'quit': False}
+                recording.segments.append(segment)
+            elif byte == 0x12:
+                segment['quit'] = True
+            else:
+                raise ValueError(f"bad byte {byte:#x} at offset {pos - 1} in recording")
+        return recording
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+class ReplayMismatch(Exception):
+    """A replayed world's state hash differs from the one recorded"""
+
+class Replay:
+    """Plays one segment of a Recording back headless, as fast as the world steps.
+
+    Every recorded state hash is checked on the way (ReplayMismatch on the first
+    difference). A snapshot is kept every `keyframe_every` ticks played, so
+    seek(tick) only replays from the nearest one at or before that tick.
+    """
+    def __init__(self, recording, index=0, keyframe_every=500):
+        self.recording = recording
+        self.segment = recording.segments[index]
+        self.world = recording.new_world(index)
+        self.keyframe_every = keyframe_every
+        self.keyframes = {0: self.world.snapshot()} if keyframe_every else {}
+        self.checked = 0
+
+    @property
+    def length(self):
+        return len(self.segment['actions'])
+
+    def play(self, until=None):
+        """Step to tick `until` (default: the end of the recording); returns the last StepResult"""
+        world = self.world
+        actions = self.segment['actions']
+        hashes = self.segment['hashes']
+        until = len(actions) if until is None else min(until, len(actions))
+        result = None
+        while world.ticks < until:
+            result = world.step(RECORDED_ACTIONS[actions[world.ticks]])
+            tick = result.tick
+            expected = hashes.get(tick)
+            if expected is not None:
+                if world.state_hash() != expected:
+                    raise ReplayMismatch(f"level {self.segment['level']} went a different way by tick {tick}")
+                self.checked += 1
+            if self.keyframe_every and tick % self.keyframe_every == 0 and tick not in self.keyframes:
+                self.keyframes[tick] = world.snapshot()
+        return result
+
+    def seek(self, tick):
+        """Put the world at `tick`, from the closest keyframe unless already on the way there"""
+        start = max((frame for frame in self.keyframes if frame <= tick), default=None)
+        if start is None:
+            if self.world.ticks > tick:
+                raise ValueError("can't seek backwards without keyframes")
+        elif not start <= self.world.ticks <= tick:
+            self.world.restore(self.keyframes[start])
+        self.play(tick)
+        return self.world
+
+async def show_victory_celebration(width, height, screen=SCREEN):
     confetti = [
         '🎉', '🎊', '✨', '⭐', '🌟', '🎈',
         '🔵', '🟦', '💠', '🌐',
@@ -486,8 +2548,6 @@ def show_victory_celebration(width, height):
     celebration_frames = 5
       
     for _ in range(celebration_frames):
-        os.system('cls' if os.name == 'nt' else 'clear')
-        
         # Create empty celebration frame
         frame = [[' ' for _ in range(width)] for _ in range(height)]
         
@@ -497,111 +2557,545 @@ def show_victory_celebration(width, height):
             y = random.randint(0, height-1)
             frame[y][x] = random.choice(confetti)
         
-        # Draw the frame
-        print('=' * (width + 2))
-        for row in frame:
-            print(f"|{''.join(row)}|")
-        print('=' * (width + 2))
-        
         # Victory message with rainbow borders
         message = "🌈 🏆 CONGRATULATIONS! YOU WIN! 🏆 🌈"
         padding = (width - len(message)) // 2
-        print('\n' + ' ' * padding + message)
+        screen.render(framed(frame, width) + [[''], [' ' * padding + message]])
         
-        time.sleep(0.5)  # Pause between frames
+        await asyncio.sleep(0.5)  # Pause between frames
+
+LEVEL_TITLES = {2: "Double Trouble!", 3: "Triple Threat!"}
+COUNT_WORDS = ('NO', 'ONE', 'TWO', 'THREE', 'FOUR', 'FIVE', 'SIX', 'SEVEN', 'EIGHT', 'NINE', 'TEN')
 
-def show_level_transition():
+async def show_level_transition(screen=SCREEN, level=2):
+    wolves = COUNT_WORDS[level] if level < len(COUNT_WORDS) else str(level)
     messages = [
         "🌙 Night falls... More wolves emerge... 🌙",
         "🐺 The pack is growing... 🐺",
-        "Level 2: Double Trouble!",
-        "Can our hero survive against TWO wolves?",
+        f"Level {level}: {LEVEL_TITLES.get(level, 'The Pack Grows!')}",
+        f"Can our hero survive against {wolves} wolves?",
         "Get ready..."
     ]
     
     for msg in messages:
-        os.system('cls' if os.name == 'nt' else 'clear')
-        print("\n" * 10)
-        print(" " * 20 + msg)
-        time.sleep(1)
+        screen.render([['']] * 11 + [[" " * 20 + msg]])
+        await asyncio.sleep(1)
 
-def main():
-    try:
+# Keyboard key name -> World.step action
+KEY_ACTIONS = {
+    'up': 'up',
+    'down': 'down',
+    'left': 'left',
+    'right': 'right',
+    'space': 'eat',
+    'h': 'huff',
+    'q': 'quit',
+    'esc': 'quit',
+}
+CAPTURE_KEY = 'p'  # starts a cProfile/tracemalloc window when the game runs with a Profiler
+
+def huff_feedback(result):
+    """The line shown under the HUD after a huff and puff"""
+    if result.startswith("success"):
+        parts = result.split(":")
+        distance = parts[1]
+        wolves_count = parts[2]
+        if distance == "4":
+            return f"💨 *WHOOSH* You blow {wolves_count} wolves away with full force! 💨"
+        elif distance == "3":
+            return f"💨 *WHOOSH* {wolves_count} wolves are pushed back! 💨"
+        elif distance == "2":
+            return f"💨 {wolves_count} wolves stumble back a bit 💨"
+        else:
+            return f"💨 {wolves_count} wolves barely feel the breeze 💨"
+    return f"❌ Can't huff and puff: {result}"
+
+class TerminalInput:
+    """Key presses read straight from the terminal in cbreak mode: no root, no extra library.
+
+    stdin is watched by the event loop's selector and everything waiting is read
+    in one nonblocking os.read, so a burst of key repeats is one wakeup. Needs a
+    Unix terminal; raises ImportError or OSError otherwise.
+    """
+    SEQUENCES = {
+        '\x1b[A': 'up', '\x1b[B': 'down', '\x1b[C': 'right', '\x1b[D': 'left',
+        '\x1bOA': 'up', '\x1bOB': 'down', '\x1bOC': 'right', '\x1bOD': 'left',  # keypad mode
+    }
+    NAMES = {' ': 'space', '\x1b': 'esc'}
+    ESCAPE_WAIT = 0.05  # seconds an Esc at the end of a read waits for the rest of a sequence
+
+    def __init__(self, fd=None):
+        import termios
+        import tty
+        self.termios = termios
+        self.tty = tty
+        self.fd = sys.stdin.fileno() if fd is None else fd
+        if not os.isatty(self.fd):
+            raise OSError("input isn't a terminal")
+        self.saved = None
+        self.loop = None
+        self.decoder = codecs.getincrementaldecoder('utf-8')('ignore')  # keeps characters split across reads
+        self.pending = ''  # an escape sequence cut off at the end of the last read
+        self.escape_timer = None
+
+    def start(self, on_key):
+        self.saved = self.termios.tcgetattr(self.fd)
+        self.tty.setcbreak(self.fd)  # keys arrive one at a time, unechoed; Ctrl-C still works
+        os.set_blocking(self.fd, False)
+        self.loop = asyncio.get_running_loop()
+        self.loop.add_reader(self.fd, self.read, on_key)
+
+    def read(self, on_key):
+        try:
+            data = os.read(self.fd, 4096)
+        except BlockingIOError:
+            return
+        if self.escape_timer is not None:
+            self.escape_timer.cancel()
+            self.escape_timer = None
+        names, self.pending = self.parse(self.pending + self.decoder.decode(data))
+        for name in names:
+            on_key(name)
+        if self.pending:
+            self.escape_timer = self.loop.call_later(self.ESCAPE_WAIT, self.escape_timeout, on_key)
+
+    def escape_timeout(self, on_key):
+        """Nothing followed the cut-off sequence: a lone Esc was the Esc key, anything longer is dropped"""
+        self.escape_timer = None
+        pending, self.pending = self.pending, ''
+        if pending == '\x1b':
+            on_key('esc')
+
+    @classmethod
+    def parse(cls, text):
+        """Key names (as KEY_ACTIONS knows them) in a chunk of terminal input.
+
+        Returns (names, rest), where rest is an escape sequence the chunk ends
+        in the middle of (or a lone Esc), to be parsed again with the next read.
+        Escape sequences that aren't in SEQUENCES are skipped whole.
+        """
+        names = []
+        i = 0
+        while i < len(text):
+            ch = text[i]
+            if ch != '\x1b':
+                names.append(cls.NAMES.get(ch, ch.lower()))
+                i += 1
+                continue
+            end = cls.sequence_end(text, i)
+            if end is None:
+                return names, text[i:]
+            name = cls.SEQUENCES.get(text[i:end])
+            if name is not None:
+                names.append(name)
+            i = end
+        return names, ''
+
+    @staticmethod
+    def sequence_end(text, start):
+        """Index just past the escape sequence at text[start], or None if text stops before it does"""
+        if start + 1 == len(text):
+            return None
+        kind = text[start + 1]
+        if kind == '[':
+            # CSI: parameter and intermediate bytes (0x20-0x3F), then one final byte (0x40-0x7E)
+            end = start + 2
+            while end < len(text) and ' ' <= text[end] <= '?':
+                end += 1
+            if end == len(text):
+                return None
+            return end + 1 if '@' <= text[end] <= '~' else end
+        if kind == 'O':
+            # SS3: one more byte, as sent by keypad mode and F1-F4
+            return None if start + 2 == len(text) else start + 3
+        if kind == '\x1b':
+            return start + 1  # Esc pressed twice; the second one starts over
+        return start + 2  # Alt+key
+
+    def stop(self):
+        if self.escape_timer is not None:
+            self.escape_timer.cancel()
+            self.escape_timer = None
+        if self.loop is not None:
+            self.loop.remove_reader(self.fd)
+            self.loop = None
+        if self.saved is not None:
+            os.set_blocking(self.fd, True)
+            self.termios.tcsetattr(self.fd, self.termios.TCSADRAIN, self.saved)
+            self.saved = None
+
+class KeyboardInput:
+    """Key presses from the keyboard library (needs root on Linux), handed over from its listener thread"""
+    def __init__(self):
         import keyboard
-    except ImportError:
-        print("Please install the 'keyboard' library first:")
-        print("pip install keyboard")
-        return
-
-    level = 1
-    while level <= 2:  # Support for two levels
-        world = World(level=level)
-        
+        self.keyboard = keyboard
+        self.hook = None
+
+    def start(self, on_key):
+        loop = asyncio.get_running_loop()
+        self.hook = self.keyboard.on_press(lambda event: loop.call_soon_threadsafe(on_key, event.name),
+                                           suppress=True)
+
+    def stop(self):
+        if self.hook is not None:
+            self.keyboard.unhook(self.hook)
+            self.hook = None
+
+class GameLoop:
+    """Runs the game on one asyncio loop: ticks at a fixed rate, frames at a capped rate.
+
+    Key presses land in a short queue as they happen (see queue_action) and one
+    is applied per tick, so the world keeps moving whether or not anything is
+    pressed. A tick that applied a key is drawn straight away if the frame cap
+    allows. Animations and messages are timers on the same loop instead of sleeps.
+
+    While a level is played the next one is already being built on a worker
+    thread, so it's ready the moment the transition show ends.
+    """
+    def __init__(self, input_source, hero, tick_rate=5, max_fps=30, screen=SCREEN, profiler=None,
+                 capture_ticks=100, seed=None, recording=None, save_path=None, start_world=None,
+                 levels=LEVELS, **world_options):
+        self.input_source = input_source
+        self.hero = hero
+        self.tick_interval = 1 / tick_rate
+        self.frame_interval = 1 / max_fps
+        self.screen = screen
+        self.world_options = world_options
+        self.profiler = profiler
+        self.capture_ticks = capture_ticks
+        # Every level gets its own seed from this, so a whole game can be recorded and replayed
+        self.seeds = random.Random(seed)
+        self.recording = recording
+        self.save_path = save_path  # checkpoint written as each level starts and on quit
+        self.start_world = start_world  # a loaded World to carry on with instead of level 1
+        self.levels = levels
+        self.builder = None  # the worker thread levels are built on, while run() runs
+        self.level_waits = []  # seconds each level start waited for its world to be built
+        if profiler is not None:
+            self.next_action = profiler.timed('input', self.next_action)
+        self.keys = deque(maxlen=INPUT_QUEUE)  # (action, time.perf_counter() of the key press)
+        self.keys_coalesced = 0
+        self.keys_dropped = 0
+        self.applied = []  # press times of actions stepped but not on screen yet
+        self.latencies = []  # (press to screen, tick to screen) per action, in seconds
+        self.last_frame = 0.0
+        self.messages = []  # (text, loop time it goes away)
+        self.dirty = False
+        self.loop = None
+
+        # Budget bookkeeping, see report()
+        self.ticks = 0
+        self.tick_overruns = 0
+        self.ticks_dropped = 0
+        self.worst_tick = 0.0
+        self.frames = 0
+        self.frame_overruns = 0
+        self.worst_frame = 0.0
+
+    def on_key(self, name):
+        # Runs on the loop: input sources call it there (KeyboardInput via call_soon_threadsafe)
+        if name == CAPTURE_KEY and self.profiler is not None:
+            self.profiler.start_capture(self.capture_ticks)
+            return
+        action = KEY_ACTIONS.get(name)
+        if action is None:
+            return
+        outcome = queue_action(self.keys, action, time.perf_counter())
+        if outcome == 'coalesced':
+            self.keys_coalesced += 1
+        elif outcome == 'dropped':
+            self.keys_dropped += 1
+
+    def next_action(self):
+        """Oldest queued action, or None to just let the world tick"""
+        if not self.keys:
+            return None
+        action, pressed = self.keys.popleft()
+        self.applied.append((pressed, time.perf_counter()))
+        return action
+
+    def say(self, text, seconds):
+        self.messages.append((text, self.loop.time() + seconds))
+        self.dirty = True
+
+    def draw(self, world, extra=()):
+        world.draw(self.screen, [text for text, _ in self.messages] + list(extra))
+
+    async def run(self):
+        """Play every level; returns the final status ('won', 'caught', 'starved' or 'quit')"""
+        self.loop = asyncio.get_running_loop()
+        self.builder = ThreadPoolExecutor(1, thread_name_prefix='level-builder')
+        self.input_source.start(self.on_key)
+        try:
+            return await self.play_levels()
+        finally:
+            self.input_source.stop()
+            self.builder.shutdown(wait=False, cancel_futures=True)
+
+    def prepare(self, level):
+        """Start building `level`'s world (terrain, walkability, animals) on the worker thread.
+
+        Seeds are drawn in level order, whichever level is running, so --seed
+        games come out the same as when every level was built as it started.
+        """
+        build = partial(World, level=level, hero=self.hero, seed=self.seeds.getrandbits(63),
+                        clock=TickClock(self.tick_interval), **self.world_options)
+        return self.loop.run_in_executor(self.builder, build)
+
+    async def ready(self, building):
+        """The world `building` makes, noting how long the level start had to wait for it"""
+        started = time.perf_counter()
+        world = await building
+        self.level_waits.append(time.perf_counter() - started)
+        return world
+
+    async def play_levels(self):
+        world = self.start_world
+        level = world.level if world is not None else 1
+        if world is None:
+            world = await self.ready(self.prepare(level))
         while True:
-            world.update_animals()
-            world.update_hunger()
-            world.draw()
-            
-            if world.check_win_condition():
-                if level == 1:
-                    print(f"\nLevel 1 Complete! {world.hero_name} has caught all the prey animals!")
-                    show_victory_celebration(world.width, world.height)
-                    show_level_transition()
-                    level += 1
-                    break  # Break inner loop to start level 2
-                else:
-                    print(f"\nCongratulations! {world.hero_name} has beaten both levels!")
-                    print(f"You are the ultimate {world.hero_name}! {world.hero_symbol}")
-                    show_victory_celebration(world.width, world.height)
-                    return  # End game after beating level 2
-            
-            if world.game_over:
-                print(f"\n{world.game_over_message}")
-                return  # End game if caught by wolves
-                
-            if world.player_hunger <= 0:
-                world.show_game_over_animation()
-                return  # End game if starved
-            
-            try:
-                event = keyboard.read_event(suppress=True)
-                if event.event_type != 'down':
-                    continue
-                    
-                if event.name == 'h':
-                    result = world.huff_and_puff()
-                    if result.startswith("success"):
-                        parts = result.split(":")
-                        distance = parts[1]
-                        wolves_count = parts[2]
-                        if distance == "4":
-                            print(f"\n💨 *WHOOSH* You blow {wolves_count} wolves away with full force! 💨")
-                        elif distance == "3":
-                            print(f"\n💨 *WHOOSH* {wolves_count} wolves are pushed back! 💨")
-                        elif distance == "2":
-                            print(f"\n💨 {wolves_count} wolves stumble back a bit 💨")
-                        else:
-                            print(f"\n💨 {wolves_count} wolves barely feel the breeze 💨")
-                        time.sleep(0.5)
-                    else:
-                        print(f"\n❌ Can't huff and puff: {result}")
-                        time.sleep(0.5)
-                elif event.name == 'q' or event.name == 'esc':
-                    print("\nThanks for playing!")
-                    return
-                elif event.name == 'up':
-                    world.move_player(0, -1)
-                elif event.name == 'down':
-                    world.move_player(0, 1)
-                elif event.name == 'left':
-                    world.move_player(-1, 0)
-                elif event.name == 'right':
-                    world.move_player(1, 0)
-                elif event.name == 'space':
-                    world.eat_nearby_animal()
-            except KeyboardInterrupt:
-                print("\nThanks for playing!")
-                return
+            following = self.prepare(level + 1) if level < self.levels else None
+            if self.save_path is not None:
+                world.save(self.save_path)
+            if self.recording is not None:
+                self.recording.attach(world)
+            if self.profiler is not None:
+                self.profiler.attach(world)
+            status = await self.play_level(world)
+            self.messages = []
+
+            if status == 'won' and following is not None:
+                self.draw(world, [f"Level {level} Complete! {world.hero_name} has caught all the prey animals!"])
+                if not (await self.unless_quit(show_victory_celebration(world.width, world.height, self.screen)) and
+                        await self.unless_quit(show_level_transition(self.screen, level + 1))):
+                    return 'quit'
+                self.keys.clear()  # presses made during the show don't carry into the next level
+                world = await self.ready(following)
+                level += 1
+                continue
+
+            if status == 'won':
+                self.draw(world, [f"Congratulations! {world.hero_name} has beaten every level!",
+                                  f"You are the ultimate {world.hero_name}! {world.hero_symbol}"])
+                await self.unless_quit(show_victory_celebration(world.width, world.height, self.screen))
+            elif status == 'caught':
+                self.draw(world, [world.game_over_message])
+            elif status == 'starved':
+                await self.unless_quit(world.show_game_over_animation(self.screen))
+            return status
+
+    async def unless_quit(self, show):
+        """Play an animation, cutting it short if quit is pressed; False if it was"""
+        started = time.perf_counter()
+        task = asyncio.ensure_future(show)
+        try:
+            while not task.done():
+                if any(action == 'quit' for action, _ in self.keys):
+                    task.cancel()
+                    return False
+                await asyncio.wait({task}, timeout=self.tick_interval)
+            task.result()
+            return True
+        finally:
+            if self.profiler is not None:
+                self.profiler.record('animation', time.perf_counter() - started)
+
+    async def play_level(self, world):
+        self.dirty = True
+        renderer = asyncio.ensure_future(self.render_loop(world))
+        try:
+            status = await self.tick_loop(world)
+        finally:
+            renderer.cancel()
+        self.present(world)  # the last tick always makes it to the screen
+        return status
+
+    async def tick_loop(self, world):
+        next_tick = self.loop.time()
+        while True:
+            action = self.next_action()
+            if action == 'quit':
+                world.step(action)  # nothing happens, but a recording notes it
+                if self.save_path is not None:
+                    world.save(self.save_path)
+                return 'quit'
+
+            started = time.perf_counter()
+            result = world.step(action)
+            elapsed = time.perf_counter() - started
+            self.ticks += 1
+            self.worst_tick = max(self.worst_tick, elapsed)
+            if elapsed > self.tick_interval:
+                self.tick_overruns += 1
+            self.dirty = True
+
+            if result.huff is not None:
+                self.say(huff_feedback(result.huff), 0.5)
+            if result.status != 'playing':
+                return result.status
+            if self.applied and time.perf_counter() - self.last_frame >= self.frame_interval:
+                self.present(world)  # don't make a key press wait for the render loop
+
+            next_tick += self.tick_interval
+            delay = next_tick - self.loop.time()
+            if delay < -self.tick_interval:
+                # Fell more than a tick behind (slow tick, suspended terminal...):
+                # skip the missed ticks rather than racing through them
+                missed = int(-delay / self.tick_interval)
+                self.ticks_dropped += missed
+                next_tick += missed * self.tick_interval
+                delay = next_tick - self.loop.time()
+            await asyncio.sleep(max(delay, 0))
+
+    async def render_loop(self, world):
+        while True:
+            started = time.perf_counter()
+            now = self.loop.time()
+            if self.messages and any(until <= now for _, until in self.messages):
+                self.messages = [(text, until) for text, until in self.messages if until > now]
+                self.dirty = True
+            if self.dirty and started - self.last_frame >= self.frame_interval:
+                self.present(world)
+            wait = self.last_frame + self.frame_interval - time.perf_counter()
+            await asyncio.sleep(wait if wait > 0 else self.frame_interval)
+
+    def present(self, world):
+        """Draw a frame, with the budget and key-to-screen bookkeeping"""
+        started = time.perf_counter()
+        self.dirty = False
+        self.draw(world)
+        shown = time.perf_counter()
+        elapsed = shown - started
+        self.last_frame = started
+        self.frames += 1
+        self.worst_frame = max(self.worst_frame, elapsed)
+        if elapsed > self.frame_interval:
+            self.frame_overruns += 1
+        self.latencies.extend((shown - pressed, shown - stepped) for pressed, stepped in self.applied)
+        self.applied = []
+
+    def report(self):
+        """Budget summary: how often a tick or a frame took longer than it is allowed"""
+        return (f"{self.ticks} ticks: {self.tick_overruns} over the {self.tick_interval * 1000:.0f} ms budget "
+                f"(worst {self.worst_tick * 1000:.1f} ms), {self.ticks_dropped} dropped to catch up\n"
+                f"{self.frames} frames: {self.frame_overruns} over the {self.frame_interval * 1000:.0f} ms budget "
+                f"(worst {self.worst_frame * 1000:.1f} ms)\n" + self.input_report() +
+                (f"\nlevel starts waited {', '.join(f'{wait * 1000:.1f}' for wait in self.level_waits)} ms "
+                 f"for their world" if self.level_waits else ""))
+
+    def input_report(self):
+        """Key-to-screen latency: from the press, and from the tick that applied it"""
+        pressed = percentiles([latency for latency, _ in self.latencies])
+        if pressed is None:
+            return "no keys pressed"
+        stepped = percentiles([latency for _, latency in self.latencies])
+        return (f"{len(self.latencies)} keys: press to screen p50 {pressed['p50'] * 1000:.1f} ms, "
+                f"p99 {pressed['p99'] * 1000:.1f} ms; tick to screen p99 {stepped['p99'] * 1000:.1f} ms, "
+                f"worst {stepped['max'] * 1000:.1f} ms (a frame is {self.frame_interval * 1000:.0f} ms); "
+                f"{self.keys_coalesced} coalesced, {self.keys_dropped} dropped")
+
+def replay_main(path, seek=None):
+    """Play a recording back as fast as possible and check it; 1 if it didn't come out the same"""
+    recording = Recording.load(path)
+    if seek is not None:
+        level, _, tick = seek.rpartition(':')
+        index = next((i for i, segment in enumerate(recording.segments)
+                      if segment['level'] == int(level or recording.segments[0]['level'])), None)
+        if index is None:
+            print(f"No level {level} in {path}")
+            return 1
+        replay = Replay(recording, index)
+        world = replay.seek(int(tick))
+        for line in world.compose_map() + [[text] for text in world.hud_lines()]:
+            print(''.join(line))
+        return 0
+
+    for index, segment in enumerate(recording.segments):
+        replay = Replay(recording, index, keyframe_every=0)
+        start = time.perf_counter()
+        try:
+            result = replay.play()
+        except ReplayMismatch as error:
+            print(f"MISMATCH: {error}")
+            return 1
+        elapsed = time.perf_counter() - start
+        status = 'quit' if segment['quit'] else (result.status if result else 'playing')
+        print(f"level {segment['level']}: {replay.length} ticks, ended {status}, "
+              f"{replay.checked} state hashes match ({replay.length / max(elapsed, 1e-9):.0f} ticks/s)")
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Superhero survival in the terminal")
+    parser.add_argument('--tick-rate', type=float, default=5, help="world ticks per second")
+    parser.add_argument('--fps', type=float, default=30, help="most frames drawn per second")
+    parser.add_argument('--profile', nargs='?', const='profile.json', metavar='FILE',
+                        help="time each phase and write a JSON summary here at exit (default profile.json)")
+    parser.add_argument('--capture', type=int, default=0, metavar='TICKS',
+                        help=f"with --profile: cProfile and tracemalloc the first TICKS ticks; "
+                             f"pressing {CAPTURE_KEY.upper()} captures that many (or 100) at any time")
+    parser.add_argument('--seed', type=int, help="play a particular game again")
+    parser.add_argument('--levels', type=int, default=LEVELS, help=f"levels to beat (default {LEVELS})")
+    parser.add_argument('--terrain', choices=TERRAINS, default='classic',
+                        help="flat classic ground, or noise hills with caves and forests (needs NumPy)")
+    parser.add_argument('--record', metavar='FILE', help="save every tick's input here to replay later")
+    parser.add_argument('--replay', metavar='FILE', help="replay a recording headless and check it matches")
+    parser.add_argument('--seek', metavar='[LEVEL:]TICK', help="with --replay: show the world at that tick")
+    parser.add_argument('--save', metavar='FILE', help="save the game here as each level starts and when you quit")
+    parser.add_argument('--load', metavar='FILE', help="carry on from a saved game")
+    parser.add_argument('--input', choices=['terminal', 'keyboard'], default='terminal',
+                        help="read keys from the terminal (default), or with the keyboard library (needs root on Linux)")
+    args = parser.parse_args(argv)
+    if args.load and args.record:
+        parser.error("--record needs a fresh game, it can't start from --load")
+    if args.capture and not args.profile:
+        args.profile = 'profile.json'
+    if args.replay:
+        return replay_main(args.replay, args.seek)
+
+    input_source = None
+    if args.input == 'terminal':
+        try:
+            input_source = TerminalInput()
+        except (ImportError, OSError):
+            print("Can't read keys from this terminal, trying the keyboard library instead")
+    if input_source is None:
+        try:
+            input_source = KeyboardInput()
+        except ImportError:
+            print("Please install the 'keyboard' library first:")
+            print("pip install keyboard")
+            return
+
+    start_world = None
+    if args.load:
+        start_world = World.load(args.load, clock=TickClock(1 / args.tick_rate))
+        hero = start_world.hero_name, start_world.hero_symbol
+    else:
+        hero = select_character()
+    profiler = Profiler() if args.profile else None
+    if args.capture:
+        profiler.start_capture(args.capture)
+    options = {'terrain': args.terrain}
+    recording = Recording(hero, 1 / args.tick_rate, options) if args.record else None
+    game_loop = GameLoop(input_source, hero, args.tick_rate, args.fps, profiler=profiler,
+                         capture_ticks=args.capture or 100, seed=args.seed, recording=recording,
+                         save_path=args.save, start_world=start_world, levels=args.levels, **options)
+    try:
+        status = asyncio.run(game_loop.run())
+    except KeyboardInterrupt:
+        status = 'quit'
+    finally:
+        if recording is not None:
+            recording.save(args.record)
+    if status == 'quit':
+        print("\nThanks for playing!")
+    print(game_loop.report())
+    if profiler is not None:
+        profiler.write(args.profile)
+        print(f"Profile summary written to {args.profile}")
+    if recording is not None:
+        print(f"Recording saved to {args.record}, replay it with: python game.py --replay {args.record}")
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
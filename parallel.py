@@ -0,0 +1,373 @@
+"""One huge World simulated on several cores, its prey split into strips moved by worker processes.
+
+    with PartitionedWorld(width=2000, height=1000, strips=16, workers=4, hero=HERO, seed=1) as world:
+        world.spawn_animals(300000, 'rabbit', speed=1)
+        world.step()
+
+The map is cut into `strips` horizontal bands. Every tick each worker moves the
+wandering animals in its share of the strips, reading and writing the animal
+arrays, the occupancy grid and a copy of the walkability table straight from
+shared memory (multiprocessing.shared_memory); only the handoffs travel back
+pickled. A step that would leave its strip isn't taken by the worker. It is
+handed off, and once every strip is done the main process applies the
+handoffs in slot order: the lowest slot gets a contested cell, and a handoff
+onto a cell that is taken by then doesn't happen. Wolves, eating and huffing
+run on the main process afterwards as always, on the same arrays, so they see
+every animal wherever its strip is.
+
+Strips draw their random numbers from (seed, tick, strip), so a seed and a
+strip count give the same game with any number of workers, or none.
+
+    python parallel.py                                # ticks/s with 1 to cpu_count workers
+    python parallel.py --animals 500000 --size 4000x2000 --workers 1 2 4 8
+"""
+import argparse
+import os
+import sys
+import time
+import weakref
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import game
+
+HERO = ('Batman', '🦇')
+# EntityStore's per-animal arrays, with the types it gives them
+COLUMNS = (('x', 'int32'), ('y', 'int32'), ('species', 'int16'), ('speed', 'int16'),
+           ('move_counter', 'int16'), ('alive', 'bool'), ('wandering', 'bool'))
+NO_MOVES = None  # (slots, cells) with nothing in them, made on first use
+
+
+def release(pool, blocks, retired):
+    """Stop the workers and free every shared memory block a SharedEntityStore made"""
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+    for block in list(blocks.values()) + retired:
+        try:
+            block.close()
+        except BufferError:
+            pass  # an array still points into it; the mapping goes when the process does
+        try:
+            block.unlink()
+        except FileNotFoundError:
+            pass  # retired blocks are unlinked as soon as they are replaced
+
+
+class SharedEntityStore(game.EntityStore):
+    """EntityStore whose arrays live in shared memory and whose prey move strip by strip.
+
+    workers=0 moves every strip in this process, which comes out the same as any
+    number of worker processes. Call close() (or use the world as a context
+    manager) to stop the workers and free the memory.
+    """
+    def __init__(self, world, strips, workers, capacity=1024):
+        self.blocks = {}  # array name -> SharedMemory holding it
+        self.shapes = {}  # array name -> (dtype, length)
+        self.retired = []  # blocks replaced when the arrays grew
+        self.strips = max(1, min(strips, world.height))
+        self.workers = workers
+        self.pool = ProcessPoolExecutor(workers) if workers else None
+        self.finalizer = weakref.finalize(self, release, self.pool, self.blocks, self.retired)
+        super().__init__(world, capacity)
+        self.seed = int(self.np_rng.integers(2 ** 63))
+        # Workers only see walkability through this copy, refreshed when the terrain changes
+        self.shared_walkable = self.shared('walkable', 'uint8', self.width * self.height)
+        self.walkable_version = None
+        self.ticks = 0
+        self.handoffs = 0  # steps across a strip edge asked for
+        self.handoffs_taken = 0
+
+    def shared(self, name, dtype, length):
+        """New zeroed array in its own shared memory block, replacing any earlier one of that name"""
+        old = self.blocks.get(name)
+        if old is not None:
+            old.unlink()  # arrays on it may still be around, it is closed by release()
+            self.retired.append(old)
+        block = shared_memory.SharedMemory(create=True, size=max(1, length * np.dtype(dtype).itemsize))
+        self.blocks[name] = block
+        self.shapes[name] = (dtype, length)
+        array = np.ndarray(length, dtype=dtype, buffer=block.buf)
+        array.fill(0)
+        return array
+
+    def clear(self):
+        for name, dtype in COLUMNS:
+            setattr(self, name, self.shared(name, dtype, self.capacity))
+        self.speed.fill(1)
+        self.views = [None] * self.capacity
+        self.grid = self.shared('grid', 'int32', self.width * self.height)
+        self.grid.fill(-1)
+        self.count = 0
+        self.free_slots = []
+
+    def _grow(self):
+        self.capacity *= 2
+        for name, dtype in COLUMNS:
+            old = getattr(self, name)
+            new = self.shared(name, dtype, self.capacity)
+            new[:len(old)] = old
+            setattr(self, name, new)
+        self.views.extend([None] * (self.capacity - len(self.views)))
+
+    def layout(self):
+        """What a worker needs to find the arrays: (name, block name, dtype, length) for each"""
+        return tuple((name, block.name) + self.shapes[name] for name, block in self.blocks.items())
+
+    def arrays(self):
+        return {name: getattr(self, name) for name, _ in COLUMNS} | {'grid': self.grid,
+                                                                      'walkable': self.shared_walkable}
+
+    def update_prey(self, world, move_chance=0.3):
+        """Move every wandering animal for one tick, strip by strip, then apply the handoffs"""
+        if world.terrain_version != self.walkable_version:
+            self.shared_walkable[:] = np.frombuffer(world.walkable, dtype=np.uint8)
+            self.walkable_version = world.terrain_version
+        player_cell = world.player_pos[1] * self.width + world.player_pos[0]
+        job = (self.width, self.height, self.count, self.strips, self.seed, self.ticks, move_chance,
+               player_cell)
+        if self.pool is None:
+            results = [move_strips(self.arrays(), job, 0, self.strips)]
+        else:
+            # Contiguous runs of strips, as even as they divide
+            bounds = [self.strips * i // self.workers for i in range(self.workers + 1)]
+            layout = self.layout()
+            results = list(self.pool.map(move_strips_in_worker, [layout] * self.workers, [job] * self.workers,
+                                         bounds[:-1], bounds[1:]))
+        slots = np.concatenate([slots for slots, _ in results])
+        cells = np.concatenate([cells for _, cells in results])
+        self.hand_off(slots, cells)
+        self.ticks += 1
+        world.free_cells = None  # animals moved behind its back; the next spawn rebuilds it
+
+    def hand_off(self, slots, cells):
+        """Apply steps across strip edges: lowest slot first, only onto cells that are still empty"""
+        self.handoffs += slots.size
+        if not slots.size:
+            return
+        order = np.argsort(slots, kind='stable')
+        slots = slots[order]
+        cells = cells[order]
+        empty = self.grid[cells] < 0
+        slots = slots[empty]
+        cells = cells[empty]
+        cells, first = np.unique(cells, return_index=True)
+        slots = slots[first]
+        self.grid[self.y[slots] * self.width + self.x[slots]] = -1
+        self.grid[cells] = slots
+        self.x[slots] = cells % self.width
+        self.y[slots] = cells // self.width
+        self.handoffs_taken += slots.size
+
+    def close(self):
+        self.finalizer()
+
+
+class PartitionedWorld(game.World):
+    """World(entity_store=True) whose prey are moved by `workers` processes, `strips` bands of the map each.
+
+    Needs NumPy. Everything but the prey movement (wolves, the player, eating,
+    huffing, drawing) is the plain World running on the main process.
+    """
+    def __init__(self, width=2000, height=1000, strips=16, workers=None, **options):
+        if np is None:
+            raise ImportError("The partitioned simulation needs NumPy: pip install numpy")
+        self.strips = strips
+        self.workers = os.cpu_count() if workers is None else workers
+        options['entity_store'] = True
+        super().__init__(width=width, height=height, **options)
+
+    def new_entity_store(self):
+        return SharedEntityStore(self, self.strips, self.workers)
+
+    @classmethod
+    def load(cls, path, clock=None):
+        raise ValueError("partitioned worlds can't be loaded, load a World instead")
+
+    def close(self):
+        self.entity_store.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+_attached = {}  # shared memory block name -> SharedMemory, in a worker process
+
+
+def attach(layout):
+    """A worker's arrays for a layout, opening blocks it hasn't seen and closing retired ones"""
+    names = {block_name for _, block_name, _, _ in layout}
+    for block_name in [block_name for block_name in _attached if block_name not in names]:
+        _attached.pop(block_name).close()
+    arrays = {}
+    for name, block_name, dtype, length in layout:
+        block = _attached.get(block_name)
+        if block is None:
+            block = _attached[block_name] = shared_memory.SharedMemory(name=block_name)
+        arrays[name] = np.ndarray(length, dtype=dtype, buffer=block.buf)
+    return arrays
+
+
+def move_strips_in_worker(layout, job, first, last):
+    return move_strips(attach(layout), job, first, last)
+
+
+def move_strips(arrays, job, first, last):
+    """Move the wandering animals in strips first to last - 1, each strip on its own.
+
+    Returns the steps that would leave their strip, as (slots, cells) arrays for
+    SharedEntityStore.hand_off. Everything written here (positions, move counters,
+    grid cells) belongs to these strips alone, so workers never race.
+    """
+    global NO_MOVES
+    width, height, count, strips, seed, tick, move_chance, player_cell = job
+    if NO_MOVES is None:
+        NO_MOVES = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+    band = -(-height // strips)  # rows per strip, the last one may be short
+    y = arrays['y'][:count]
+    members = np.flatnonzero(arrays['wandering'][:count] & (y >= first * band) & (y < last * band))
+    strip_of = y[members] // band
+    order = np.argsort(strip_of, kind='stable')  # keeps slot order within each strip
+    members = members[order]
+    starts = np.searchsorted(strip_of[order], np.arange(first, last + 1))
+    moves = [move_strip(arrays, job, strip, strip * band, min(height, (strip + 1) * band),
+                        members[starts[i]:starts[i + 1]])
+             for i, strip in enumerate(range(first, last))]
+    moves = [move for move in moves if move[0].size]
+    if not moves:
+        return NO_MOVES
+    return np.concatenate([slots for slots, _ in moves]), np.concatenate([cells for _, cells in moves])
+
+
+def move_strip(arrays, job, strip, top, bottom, members):
+    """EntityStore.update_prey for the animals standing in rows top to bottom - 1"""
+    width, height, count, strips, seed, tick, move_chance, player_cell = job
+    x, y, grid, walkable = arrays['x'], arrays['y'], arrays['grid'], arrays['walkable']
+    move_counter = arrays['move_counter']
+    rng = np.random.default_rng([seed, tick, strip])
+
+    movers = members[rng.random(members.size) < move_chance]
+    move_counter[movers] += 1
+    movers = movers[move_counter[movers] >= arrays['speed'][movers]]
+    move_counter[movers] = 0
+    if not movers.size:
+        return NO_MOVES
+
+    orders = game.EntityStore.direction_orders()
+    steps = np.array(game.DIRECTIONS, dtype=np.int32)
+    order = orders[rng.integers(0, len(orders), movers.size)]
+    step_x = steps[order, 0]
+    step_y = steps[order, 1]
+    old_x = x[movers]
+    old_y = y[movers]
+    targets = np.full(movers.size, -1, dtype=np.int64)  # cell taken inside the strip
+    leaving = np.full(movers.size, -1, dtype=np.int64)  # cell asked for in another strip
+
+    for attempt in range(len(game.DIRECTIONS)):
+        pending = np.flatnonzero((targets < 0) & (leaving < 0))
+        if not pending.size:
+            break
+        new_x = old_x[pending] + step_x[pending, attempt]
+        new_y = old_y[pending] + step_y[pending, attempt]
+        inside = (new_x >= 0) & (new_x < width) & (new_y >= 0) & (new_y < height)
+        pending = pending[inside]
+        new_y = new_y[inside]
+        cells = new_y * width + new_x[inside]
+        legal = (walkable[cells] == 1) & (cells != player_cell)
+        pending = pending[legal]
+        new_y = new_y[legal]
+        cells = cells[legal]
+        # Another strip's grid can't be read safely, so a step out is asked for, not checked
+        home = (new_y >= top) & (new_y < bottom)
+        leaving[pending[~home]] = cells[~home]
+        pending = pending[home]
+        cells = cells[home]
+        empty = grid[cells] < 0
+        pending = pending[empty]
+        cells = cells[empty]
+        # pending is in slot order, so the first occurrence of a cell is the lowest slot
+        cells, first = np.unique(cells, return_index=True)
+        pending = pending[first]
+        grid[cells] = movers[pending]
+        targets[pending] = cells
+
+    moved = targets >= 0
+    grid[old_y[moved] * width + old_x[moved]] = -1
+    x[movers[moved]] = targets[moved] % width
+    y[movers[moved]] = targets[moved] // width
+    out = leaving >= 0
+    return movers[out].astype(np.int64), leaving[out]
+
+
+def positions_hash(world):
+    """CRC of every live animal's slot and position, to check worker counts agree"""
+    store = world.entity_store
+    live = np.flatnonzero(store.alive[:store.count])
+    crc = zlib.crc32(live.astype(np.int64).tobytes())
+    crc = zlib.crc32(store.x[live].tobytes(), crc)
+    return zlib.crc32(store.y[live].tobytes(), crc)
+
+
+def time_ticks(world, ticks):
+    world.update_animals()  # first tick starts the workers
+    start = time.perf_counter()
+    for _ in range(ticks):
+        world.update_animals()
+    return ticks / (time.perf_counter() - start)
+
+
+def bench(width, height, animals, strips, worker_counts, ticks, seed=1):
+    """ticks/s of update_animals for the one-process EntityStore and each worker count"""
+    reference = game.World(width=width, height=height, hero=HERO, seed=seed, clock=game.TickClock(),
+                           entity_store=True)
+    reference.spawn_animals(animals, 'rabbit', speed=1)
+    rows = [('EntityStore', time_ticks(reference, ticks), None, None)]
+    for workers in worker_counts:
+        with PartitionedWorld(width, height, strips, workers, hero=HERO, seed=seed,
+                              clock=game.TickClock()) as world:
+            world.spawn_animals(animals, 'rabbit', speed=1)
+            rate = time_ticks(world, ticks)
+            store = world.entity_store
+            share = store.handoffs_taken / store.handoffs if store.handoffs else 0.0
+            rows.append((workers, rate, positions_hash(world), share))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', default='2000x1000', help="map WIDTHxHEIGHT")
+    parser.add_argument('--animals', type=int, default=300000)
+    parser.add_argument('--strips', type=int, default=16)
+    parser.add_argument('--workers', type=int, nargs='+', default=None,
+                        help="worker counts to time (default 1 to cpu_count); 0 runs the strips in-process")
+    parser.add_argument('--ticks', type=int, default=20)
+    args = parser.parse_args(argv)
+    if np is None:
+        raise SystemExit("The partitioned simulation needs NumPy: pip install numpy")
+    width, height = map(int, args.size.split('x'))
+    worker_counts = args.workers or list(range(1, os.cpu_count() + 1))
+
+    rows = bench(width, height, args.animals, args.strips, worker_counts, args.ticks)
+    print(f"{width}x{height}, {args.animals} animals, {args.strips} strips, {os.cpu_count()} cores")
+    print(f"{'workers':>11} {'ticks/s':>8} {'speedup':>8} {'handoffs taken':>15} {'positions':>10}")
+    base = next((rate for workers, rate, _, _ in rows if workers == 1), rows[0][1])
+    hashes = {crc for workers, _, crc, _ in rows if crc is not None}
+    for workers, rate, crc, share in rows:
+        taken = '-' if share is None else f"{share:.0%}"
+        print(f"{workers:>11} {rate:>8.1f} {rate / base:>7.2f}x {taken:>15} {crc if crc is not None else '-':>10}")
+    if len(hashes) > 1:
+        print("worker counts disagree about where the animals ended up")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
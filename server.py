@@ -0,0 +1,389 @@
+"""Host many games in one process: one asyncio loop, one World per connection.
+
+    python server.py serve --port 7777              # or --unix /tmp/game.sock
+    python server.py client --port 7777 --count 50  # stand-in players
+    python server.py bench --sessions 100 200 400   # how many sessions fit on a core
+
+A client sends one line per key press: an action (up, down, left, right, eat,
+huff, quit) or a key name the game knows (space, h, q, esc). The game starts on
+the first line, which may be "hello <hero>" to pick a hero. The server answers
+with the game's own differential ANSI frames, so plain `nc localhost 7777` in a
+terminal is a (clunky) client: type an action and press Enter.
+"""
+import argparse
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import socket
+import sys
+import tempfile
+import time
+from collections import deque
+
+import game
+
+HEROES = {name.lower(): (name, symbol) for name, symbol, _ in game.CHARACTERS}
+HIGH_WATER = 64 * 1024  # bytes a client hasn't read yet before its frames are skipped
+HARD_LIMIT = 1024 * 1024  # bytes a client hasn't read yet before it is dropped
+BATCH_WINDOW = 0.005  # sessions due this close together are ticked in one batch
+MESSAGE_TICKS = 5  # how long huff feedback stays under the HUD
+
+
+class StreamOut:
+    """File-like end of a TerminalRenderer that hands frames to an asyncio transport"""
+    def __init__(self, writer):
+        self.writer = writer
+
+    def write(self, text):
+        self.writer.write(text.encode())
+
+    def flush(self):
+        pass
+
+
+class Session:
+    """One connected player: their world, their input queue and their screen"""
+    def __init__(self, number, writer, hero, tick_interval, world_options, now):
+        self.number = number
+        self.writer = writer
+        self.hero = hero
+        self.tick_interval = tick_interval
+        self.world_options = world_options
+        self.level = 1
+        self.world = self.new_world()
+        self.screen = game.TerminalRenderer(StreamOut(writer))
+        self.inputs = deque(maxlen=game.INPUT_QUEUE)  # (action, loop time it arrived)
+        self.messages = []
+        self.message_until = 0
+        self.next_tick = now + tick_interval
+        self.last_input = now
+        self.closed = False
+        self.frames_sent = 0
+        self.frames_skipped = 0
+        self.inputs_dropped = 0
+        self.inputs_coalesced = 0
+
+    def new_world(self):
+        return game.World(level=self.level, hero=self.hero, clock=game.TickClock(self.tick_interval),
+                          **self.world_options)
+
+    def push(self, action, now):
+        outcome = game.queue_action(self.inputs, action, now)
+        if outcome == 'coalesced':
+            self.inputs_coalesced += 1
+        elif outcome == 'dropped':
+            self.inputs_dropped += 1
+        self.last_input = now
+
+    def tick(self):
+        """Step the world once with the oldest queued key; False once the game is over"""
+        world = self.world
+        result = world.step(self.inputs.popleft()[0] if self.inputs else None)
+        if result.huff is not None:
+            self.say(game.huff_feedback(result.huff))
+        elif self.messages and world.ticks >= self.message_until:
+            self.messages = []
+
+        if result.status == 'playing':
+            return True
+        if result.status == 'won' and self.level < game.LEVELS:
+            self.level += 1
+            self.world = self.new_world()
+            title = game.LEVEL_TITLES.get(self.level, 'The Pack Grows!')
+            self.say(f"Level {self.level - 1} Complete! 🌙 Level {self.level}: {title}")
+            return True
+        self.messages = [{
+            'won': f"Congratulations! {world.hero_name} has beaten every level! {world.hero_symbol}",
+            'caught': world.game_over_message,
+            'starved': f"💀 GAME OVER! {world.hero_name} has starved! 💀",
+            'quit': "Thanks for playing!",
+        }[result.status]]
+        return False
+
+    def say(self, text):
+        self.messages = [text]
+        self.message_until = self.world.ticks + MESSAGE_TICKS
+
+    def backlog(self):
+        return self.writer.transport.get_write_buffer_size()
+
+    def send_frame(self, force=False):
+        """Draw unless the client is behind; a skipped frame just folds into the next diff"""
+        if self.backlog() > HIGH_WATER and not force:
+            self.frames_skipped += 1
+            return
+        self.world.draw(self.screen, self.messages)
+        self.frames_sent += 1
+
+
+class GameServer:
+    """Sessions ticked in batches by one scheduler, at a fixed rate each"""
+    def __init__(self, tick_rate=5, idle_timeout=300.0, world_options=None, report_every=10.0):
+        self.tick_rate = tick_rate
+        self.tick_interval = 1 / tick_rate
+        self.idle_timeout = idle_timeout
+        self.world_options = world_options or {}
+        self.report_every = report_every
+        self.sessions = {}
+        self.due = []  # heap of (next tick time, session number); closed sessions drop out lazily
+        self.numbers = itertools.count(1)
+        self.wakeup = None
+
+        # Since the last report
+        self.ticks = 0
+        self.batches = 0
+        self.late = 0
+        self.tick_cpu = 0.0
+        self.evicted = {'idle': 0, 'slow': 0}
+        self.window = (time.perf_counter(), time.process_time())
+
+    async def handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        session = None
+        try:
+            while session is None or not session.closed:
+                line = await reader.readline()
+                if not line:
+                    break
+                word = line.decode(errors='replace').strip().lower()
+                if session is None:
+                    name = word[len('hello'):].strip() if word.startswith('hello') else ''
+                    session = self.open(writer, HEROES.get(name, HEROES['batman']))
+                    if word.startswith('hello'):
+                        continue
+                action = word if word in game.ACTIONS else game.KEY_ACTIONS.get(word)
+                if action is not None:
+                    session.push(action, loop.time())
+        except ConnectionError:
+            pass
+        finally:
+            if session is not None:
+                self.close(session)
+            else:
+                writer.close()
+
+    def open(self, writer, hero):
+        now = asyncio.get_running_loop().time()
+        session = Session(next(self.numbers), writer, hero, self.tick_interval, self.world_options, now)
+        self.sessions[session.number] = session
+        heapq.heappush(self.due, (session.next_tick, session.number))
+        session.send_frame()
+        self.wakeup.set()
+        return session
+
+    def close(self, session):
+        if session.closed:
+            return
+        session.closed = True
+        self.sessions.pop(session.number, None)
+        session.writer.close()
+
+    def finish(self, session, message=None):
+        """Last frame (unless the client is hopelessly behind), then hang up"""
+        if message is not None:
+            session.messages = [message]
+        if session.backlog() <= HARD_LIMIT:
+            session.send_frame(force=True)
+            session.writer.write(b'\r\n')
+        self.close(session)
+
+    async def scheduler(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self.due:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+            delay = self.due[0][0] - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            started = time.process_time()
+            now = loop.time()
+            batch = []
+            while self.due and self.due[0][0] <= now + BATCH_WINDOW:
+                _, number = heapq.heappop(self.due)
+                session = self.sessions.get(number)
+                if session is not None:
+                    batch.append(session)
+            for session in batch:
+                if not session.tick():
+                    self.finish(session)
+                    continue
+                session.send_frame()
+                session.next_tick += self.tick_interval
+                if session.next_tick < now:
+                    # More than a tick behind: skip ahead instead of bursting through the backlog
+                    self.late += 1
+                    session.next_tick = now + self.tick_interval
+                heapq.heappush(self.due, (session.next_tick, session.number))
+            self.ticks += len(batch)
+            self.batches += 1
+            self.tick_cpu += time.process_time() - started
+            await asyncio.sleep(0)  # let reads and writes through between batches
+
+    async def reaper(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(1)
+            now = loop.time()
+            for session in list(self.sessions.values()):
+                if session.backlog() > HARD_LIMIT:
+                    self.evicted['slow'] += 1
+                    self.close(session)
+                elif now - session.last_input > self.idle_timeout:
+                    self.evicted['idle'] += 1
+                    self.finish(session, f"Closed after {self.idle_timeout:.0f}s without a key press")
+
+    def report(self):
+        """Load since the last report, and how many sessions one core would take at this rate"""
+        wall = time.perf_counter() - self.window[0]
+        cpu = time.process_time() - self.window[1]
+        busy = cpu / wall if wall else 0.0
+        sessions = len(self.sessions)
+        line = (f"{sessions} sessions, {self.ticks / wall:.0f} ticks/s in {self.batches / wall:.0f} batches/s, "
+                f"{self.late} late, CPU {busy:.0%} (ticking and drawing {self.tick_cpu / wall:.0%}), "
+                f"evicted {self.evicted['idle']} idle {self.evicted['slow']} slow")
+        if sessions and busy:
+            line += f": about {sessions / busy:.0f} sessions per core at {self.tick_rate:g} ticks/s"
+        self.ticks = self.batches = self.late = 0
+        self.tick_cpu = 0.0
+        self.evicted = {'idle': 0, 'slow': 0}
+        self.window = (time.perf_counter(), time.process_time())
+        return line
+
+    async def reporter(self):
+        while True:
+            await asyncio.sleep(self.report_every)
+            print(self.report(), flush=True)
+
+    async def start(self, host='127.0.0.1', port=7777, unix=None):
+        """Listen and start the scheduler; returns the asyncio Server"""
+        self.wakeup = asyncio.Event()
+        if unix:
+            server = await asyncio.start_unix_server(self.handle, path=unix)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        self.tasks = [asyncio.ensure_future(task()) for task in (self.scheduler, self.reaper)]
+        if self.report_every:
+            self.tasks.append(asyncio.ensure_future(self.reporter()))
+        return server
+
+    async def stop(self, server):
+        server.close()
+        for task in self.tasks:
+            task.cancel()
+        for session in list(self.sessions.values()):
+            self.close(session)
+        await server.wait_closed()
+
+
+def connector(args):
+    if args.unix:
+        return lambda: asyncio.open_unix_connection(args.unix)
+    return lambda: asyncio.open_connection(args.host, args.port)
+
+
+async def stand_in(number, connect, duration, keys_per_second, totals):
+    """A pretend player pressing random keys; starts a new game whenever one ends"""
+    loop = asyncio.get_running_loop()
+    rng = random.Random(number)
+    end = loop.time() + duration
+    while loop.time() < end:
+        reader, writer = await connect()
+        writer.write(f"hello {rng.choice(list(HEROES))}\n".encode())
+        totals['games'] += 1
+
+        async def read():
+            try:
+                while True:
+                    data = await reader.read(65536)
+                    if not data:
+                        return
+                    totals['bytes'] += len(data)
+                    totals['frames'] += data.count(b'\x1b[J')
+            except OSError:
+                pass  # the server hung up mid-frame, e.g. after the game ended
+        reading = asyncio.ensure_future(read())
+        while loop.time() < end and not reading.done():
+            await asyncio.sleep(rng.expovariate(keys_per_second))
+            writer.write(rng.choice(['up', 'down', 'left', 'right', 'eat', 'huff']).encode() + b'\n')
+        if not reading.done():
+            writer.write(b'quit\n')
+            await reading
+        writer.close()
+
+
+async def run_clients(args):
+    totals = {'games': 0, 'frames': 0, 'bytes': 0}
+    start = time.perf_counter()
+    await asyncio.gather(*(stand_in(i, connector(args), args.duration, args.keys_per_second, totals)
+                           for i in range(args.count)))
+    elapsed = time.perf_counter() - start
+    frames = max(totals['frames'], 1)
+    print(f"{args.count} clients, {totals['games']} games: {totals['frames'] / elapsed / args.count:.1f} "
+          f"frames/s each, {totals['bytes'] / frames:.0f} bytes per frame")
+
+
+async def serve(args):
+    server = GameServer(args.tick_rate, args.idle_timeout, {'width': args.width, 'height': args.height})
+    listener = await server.start(args.host, args.port, args.unix)
+    print(f"Serving on {args.unix or f'{args.host}:{args.port}'} at {args.tick_rate:g} ticks/s", flush=True)
+    try:
+        await listener.serve_forever()
+    finally:
+        await server.stop(listener)
+
+
+async def bench(args):
+    """Run the server here and stand-in clients in another process, at growing session counts"""
+    print(f"{'sessions':>8} {'ticks/s':>8} {'target':>7} {'late':>5} {'CPU':>5} {'per core':>9}")
+    for sessions in args.sessions:
+        server = GameServer(args.tick_rate, report_every=0,
+                            world_options={'width': args.width, 'height': args.height})
+        with tempfile.TemporaryDirectory() as folder:
+            unix = os.path.join(folder, 'game.sock') if hasattr(socket, 'AF_UNIX') else None
+            listener = await server.start('127.0.0.1', 0, unix)
+            where = ['--unix', unix] if unix else ['--port', str(listener.sockets[0].getsockname()[1])]
+            clients = await asyncio.create_subprocess_exec(
+                sys.executable, __file__, 'client', *where, '--count', str(sessions),
+                '--duration', str(args.duration + 2), stdout=asyncio.subprocess.DEVNULL)
+            await asyncio.sleep(2)  # let everyone connect
+            server.report()
+            await asyncio.sleep(args.duration)
+            wall = time.perf_counter() - server.window[0]
+            busy = (time.process_time() - server.window[1]) / wall
+            ticks = server.ticks / wall
+            print(f"{len(server.sessions):>8} {ticks:>8.0f} {sessions * args.tick_rate:>7.0f} {server.late:>5} "
+                  f"{busy:>5.0%} {len(server.sessions) / max(busy, 1e-9):>9.0f}", flush=True)
+            await clients.wait()
+            await server.stop(listener)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('mode', choices=['serve', 'client', 'bench'])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7777)
+    parser.add_argument('--unix', metavar='PATH', help="use a Unix socket instead of TCP")
+    parser.add_argument('--tick-rate', type=float, default=5, help="ticks per second for every session")
+    parser.add_argument('--idle-timeout', type=float, default=300, help="seconds without input before eviction")
+    parser.add_argument('--width', type=int, default=40)
+    parser.add_argument('--height', type=int, default=20)
+    parser.add_argument('--count', type=int, default=10, help="client: stand-in players to run")
+    parser.add_argument('--duration', type=float, default=10, help="client and bench: seconds to run")
+    parser.add_argument('--keys-per-second', type=float, default=3, help="client: key presses per player")
+    parser.add_argument('--sessions', type=int, nargs='+', default=[50, 100, 200, 400],
+                        help="bench: session counts to try")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run({'serve': serve, 'client': run_clients, 'bench': bench}[args.mode](args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()